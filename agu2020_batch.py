@@ -0,0 +1,132 @@
+# Batch version of agu2020_scrape.py: makes schedules for a bunch of departments and/or meetings in one run
+#
+# Running agu2020_scrape.py once per department means downloading and parsing allauthors.html all over again every time,
+# and downloading the same abstracts again for every department that shares co-authors.
+# This takes a manifest file listing all the schedules to make, and:
+# - downloads & parses each meeting's allauthors.html only once, no matter how many departments use it (different meetings load at the same time)
+# - puts every abstract from every department into one big list so each one is only downloaded and parsed once, all in one pipeline (see scrapeAbstracts() in agu2020_tools.py)
+# - then writes out each department's schedule from the shared results
+# So making schedules for a whole college costs about the same as making one.
+#
+# The manifest is a CSV file with no fieldnames on the first line, one schedule per line:
+#   allauthors URL,department list CSV file,output html file
+# e.g.
+#   https://agu.confex.com/agu/fm20/webprogram/allauthors.html,geosciences.csv,geosciences_schedule.html
+#
+# The department list files are the same format agu2020_scrape.py uses.
+
+# importing libraries
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from agu2020_tools import readDeptList, fetchPageChunks, iterAuthors, matchDeptPresenters, planAbstractURLs, scrapeAbstracts, buildAbstractDict, listDeptPresenters, renderSchedule, AuthorIndex, TokenBucket, ResponseCache, ScrapeStore, RunMetrics
+
+
+# Reads the manifest into a list of (allauthors URL, department list file, output html file) tuples. Blank lines are skipped.
+def readManifest(manifestFile):
+    jobs = []
+    with open(manifestFile, "rt", newline="") as inputFile:
+        for row in csv.reader(inputFile):
+            if not row or not "".join(row).strip():
+                continue
+            if len(row) != 3:
+                raise SystemExit("Manifest lines need to be allauthors URL,department list file,output html file. Got: {}".format(",".join(row)))
+            jobs.append(tuple(x.strip() for x in row))
+    return jobs
+
+
+# Downloads and parses one meeting's allauthors.html (streaming, like agu2020_scrape.py does by default) and builds the name index for it
+def loadMeeting(allAuthorsURL, bucket, cache, metrics=None):
+    talkBaseURL = allAuthorsURL.rsplit("/", 1)[0] + "/" # talk URLs on the page are relative to the folder allauthors.html is in
+    aguAllAuthorsDict = dict(iterAuthors(fetchPageChunks(allAuthorsURL, bucket, cache=cache, metrics=metrics), talkBaseURL))
+    print("Parsed {} AGU authors from {}".format(len(aguAllAuthorsDict), allAuthorsURL))
+    return aguAllAuthorsDict, AuthorIndex(list(aguAllAuthorsDict.keys()))
+
+
+# Runs every job in the manifest. The settings mean the same thing as the parameters in agu2020_scrape.py.
+# If a RunMetrics is passed in, each stage of the batch gets timed in it along with all the requests.
+def runBatch(jobs, maxConcurrentRequests=8, requestsPerSecond=3, parseWorkers=4, cache=None, store=None, earlyAbort=True, metrics=None, appendSchedule=False):
+    if not jobs:
+        raise SystemExit("No schedules to make: the manifest doesn't have any allauthors URL,department list file,output html file lines in it")
+    if metrics is None:
+        metrics = RunMetrics() # so the stages below can always be timed, even if nobody looks at them
+    # Every meeting's allauthors.html gets loaded once, all at the same time. They share the one rate limiter since they're all on the same server.
+    bucket = TokenBucket(requestsPerSecond)
+    meetingURLs = list(dict.fromkeys(job[0] for job in jobs)) # no duplicates, same order as the manifest
+    with metrics.stage("allAuthors"):
+        with ThreadPoolExecutor(max_workers=len(meetingURLs)) as pool:
+            meetings = dict(zip(meetingURLs, pool.map(lambda url: loadMeeting(url, bucket, cache, metrics), meetingURLs)))
+
+    # Matching each department against its meeting's authors and working out which abstracts it needs
+    jobURLPresenters = []
+    allURLs = {} # every abstract any department needs, without duplicates
+    metrics.start("nameMatching")
+    for allAuthorsURL, deptListFile, outputScheduleHTML in jobs:
+        aguAllAuthorsDict, authorIndex = meetings[allAuthorsURL]
+        deptPresenters = matchDeptPresenters(readDeptList(deptListFile), aguAllAuthorsDict, authorIndex)
+        urlPresenters, sessionURLs = planAbstractURLs(deptPresenters)
+        metrics.count("dropped.session", len(sessionURLs))
+        jobURLPresenters.append(urlPresenters)
+        allURLs.update(dict.fromkeys(urlPresenters))
+        print("{}: {} unique abstracts to scrape for {} possible department presenters".format(deptListFile, len(urlPresenters), len(deptPresenters)))
+    metrics.stop("nameMatching")
+
+    # One pipeline for every abstract from every department
+    metrics.start("abstractCrawl")
+    print("\nDownloading {} abstract pages for {} schedules, {} at a time, and parsing them with {} workers".format(len(allURLs), len(jobs), maxConcurrentRequests, parseWorkers))
+    parsedAbstracts = {}
+    statusCounts = {}
+    for presentationURL, fromCache, status, record, changed in scrapeAbstracts(allURLs.keys(), maxConcurrentRequests, requestsPerSecond, cache, parseWorkers, store=store, earlyAbort=earlyAbort, metrics=metrics):
+        statusCounts[status] = statusCounts.get(status, 0) + 1
+        if status == "ok":
+            parsedAbstracts[presentationURL] = record
+    metrics.stop("abstractCrawl")
+    print("Done scraping: {}".format(", ".join("{} {}".format(count, status) for status, count in sorted(statusCounts.items()))))
+
+    # And then each department's schedule gets made out of the shared results
+    metrics.start("render")
+    for (allAuthorsURL, deptListFile, outputScheduleHTML), urlPresenters in zip(jobs, jobURLPresenters):
+        abstractByURLDict = buildAbstractDict(urlPresenters, parsedAbstracts)
+        deptPresenterList = listDeptPresenters(abstractByURLDict)
+        sortedDict = sorted(abstractByURLDict.items(), key = lambda x:x[1]['time'])
+        with open(outputScheduleHTML, 'a' if appendSchedule else 'w', encoding='utf-8') as outfile:
+            outfile.write(renderSchedule(sortedDict, deptPresenterList))
+        print("{} talks by {} department members written to {}".format(len(abstractByURLDict), len(deptPresenterList), outputScheduleHTML))
+    metrics.stop("render")
+
+
+if __name__ == "__main__":
+    # Parameters
+    manifestFile = r""
+    maxConcurrentRequests = 8 # how many abstract pages can be downloading at the same time, for all the jobs put together
+    requestsPerSecond = 3 # rate limit for the confex server, for all the jobs put together
+    parseWorkers = os.cpu_count() or 1 # how many worker processes parse abstract pages. 0 parses them one at a time in this process instead
+    earlyAbort = True # skip parsing an abstract page as soon as its author list shows there's nobody from U-Mass on it
+    cacheDir = r"agu2020_cache" # same cache folder as agu2020_scrape.py, so they can share downloaded pages. Set to r"" to turn off the cache
+    cacheMaxAge = 600 # seconds
+    cacheMaxSizeMB = 500
+    stateDB = r"agu2020_batch_state.sqlite" # separate from agu2020_scrape.py's, since each one keeps track of its own runs. Set to r"" to turn it off
+    appendSchedule = False # each schedule replaces whatever's in its output file. Set to True to add it to the end of the file instead
+    metricsReport = r"agu2020_batch_metrics.json" # timing, request & cache numbers for the run get saved here as JSON. Set to r"" to just print them
+
+    jobs = readManifest(manifestFile)
+    if not jobs:
+        raise SystemExit("{} doesn't have any schedules in it".format(manifestFile))
+    print("{} schedules to make for {} meetings".format(len(jobs), len(set(job[0] for job in jobs))))
+    cache = ResponseCache(cacheDir, cacheMaxAge, cacheMaxSizeMB) if cacheDir else None
+    store = None
+    if stateDB:
+        store = ScrapeStore(stateDB)
+        if store.startRun(",".join(sorted(set(job[0] for job in jobs)))): # the batch's "meeting" is all of its allauthors URLs together
+            print("Last run didn't finish, picking up where it left off")
+    metrics = RunMetrics()
+    runBatch(jobs, maxConcurrentRequests, requestsPerSecond, parseWorkers, cache, store, earlyAbort, metrics, appendSchedule)
+    if cache is not None:
+        cache.evict() # trims the cache back down to cacheMaxSizeMB
+    if store is not None:
+        store.finishRun()
+        store.close()
+    metrics.printSummary()
+    if metricsReport:
+        metrics.writeReport(metricsReport)
+        print("Run metrics written to {}".format(metricsReport))
@@ -0,0 +1,163 @@
+# Benchmarks the whole scraper offline against agu2020_mockserver.py, at a few different meeting sizes
+#
+# For each meeting size (1,000, 10,000 and 100,000 authors by default) this:
+# - starts a mock confex server in its own process, making up a meeting that size plus a department list of U-Mass authors from it
+# - runs the batch pipeline (runBatch() in agu2020_batch.py) against it in another fresh process, with no cache and no state database so every run starts cold
+# - reports end-to-end pages/sec, the abstract crawl's pages/sec, peak memory (RSS) and how long each stage took
+# Running each size in a fresh process means the memory numbers for one size don't include leftovers from the last one.
+# Nothing here touches the real agu.confex.com.
+#
+# Results get printed as a table and saved as JSON. Pass --baseline with an earlier results file to check for slowdowns, e.g.
+#   python agu2020_benchmark.py --sizes 1000,10000 --output before.json
+#   ... change some code ...
+#   python agu2020_benchmark.py --sizes 1000,10000 --baseline before.json
+# which exits with an error if pages/sec dropped, or peak memory grew, by more than --tolerance at any size.
+
+# importing libraries
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource # not on Windows, so no memory numbers there
+except ImportError:
+    resource = None
+
+scriptDir = os.path.dirname(os.path.abspath(__file__))
+
+
+# Peak RSS in MB of this process plus the most of any of its finished child processes (the parse workers), or None if it can't be measured here
+def peakRSSMB():
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024 # macOS reports bytes, Linux reports KB
+    ownPeak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    childPeak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(ownPeak, 1), round(childPeak, 1)
+
+
+# Starts agu2020_mockserver.py on a free port and waits for it to say where it's serving. Returns (process, allauthors URL).
+def startMockServer(numAuthors, deptListFile, args):
+    command = [sys.executable, os.path.join(scriptDir, "agu2020_mockserver.py"), "--authors", str(numAuthors), "--port", "0", "--seed", str(args.seed),
+               "--latency", str(args.latency), "--error-rate", str(args.error_rate), "--session-rate", str(args.session_rate), "--dept-list", deptListFile, "--dept-size", str(args.dept_size)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in server.stdout:
+        if line.startswith("Serving "):
+            return server, line.split(" at ")[-1].strip()
+    server.wait()
+    raise SystemExit("Mock server for {} authors didn't start".format(numAuthors))
+
+
+# Runs the pipeline once in this process and returns the measurements. This is what the child process does.
+def runOnce(allAuthorsURL, deptListFile, outputScheduleHTML, args):
+    from agu2020_batch import runBatch # imported here so the parent process never loads the pipeline
+    from agu2020_tools import RunMetrics
+    metrics = RunMetrics()
+    with open(os.devnull, "wt") as devnull, contextlib.redirect_stdout(devnull): # the pipeline's progress printing isn't part of the benchmark output
+        start = time.perf_counter()
+        runBatch([(allAuthorsURL, deptListFile, outputScheduleHTML)], args.max_concurrent_requests, args.requests_per_second, args.parse_workers, metrics=metrics)
+        seconds = time.perf_counter() - start
+    report = metrics.report()
+    abstractRequests = report["requests"]["count"] - 1 # everything but allauthors.html
+    crawlSeconds = report["stageSeconds"].get("abstractCrawl", 0)
+    rss = peakRSSMB()
+    return {
+        "seconds": round(seconds, 3),
+        "pages": report["requests"]["count"],
+        "pagesPerSecond": round(report["requests"]["count"] / seconds, 1) if seconds else None,
+        "crawlPagesPerSecond": round(abstractRequests / crawlSeconds, 1) if crawlSeconds else None,
+        "megabytes": round(report["requests"]["bytes"] / 1024 / 1024, 2),
+        "peakRSSMB": rss[0] if rss else None,
+        "peakWorkerRSSMB": rss[1] if rss else None,
+        "stageSeconds": report["stageSeconds"],
+        "requestLatencyMs": report["requests"]["latencyMs"],
+        "parseTimeMs": report["parse"]["timeMs"],
+        "counters": report["counters"],
+    }
+
+
+# Runs one meeting size: mock server in one process, pipeline in another. Returns the child's measurements.
+def benchmarkSize(numAuthors, args):
+    with tempfile.TemporaryDirectory(prefix="agu2020_bench_") as workDir:
+        deptListFile = os.path.join(workDir, "dept.csv")
+        server, allAuthorsURL = startMockServer(numAuthors, deptListFile, args)
+        try:
+            command = [sys.executable, os.path.abspath(__file__), "--child", allAuthorsURL, deptListFile, os.path.join(workDir, "schedule.html")] + childSettings(args)
+            child = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True)
+        finally:
+            server.terminate()
+            server.wait()
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result["authors"] = numAuthors
+    return result
+
+
+# The pipeline settings get passed on to the child process as they were given
+def childSettings(args):
+    return ["--max-concurrent-requests", str(args.max_concurrent_requests), "--requests-per-second", str(args.requests_per_second), "--parse-workers", str(args.parse_workers)]
+
+
+def printTable(results):
+    print("\n{:>8} {:>7} {:>9} {:>11} {:>10} {:>10} {:>12} {:>12} {:>10}".format("authors", "pages", "pages/s", "crawl pg/s", "RSS MB", "worker MB", "allAuthors s", "matching s", "crawl s"))
+    for result in results:
+        stages = result["stageSeconds"]
+        print("{:>8} {:>7} {:>9} {:>11} {:>10} {:>10} {:>12} {:>12} {:>10}".format(result["authors"], result["pages"], result["pagesPerSecond"], result["crawlPagesPerSecond"],
+              result["peakRSSMB"], result["peakWorkerRSSMB"], stages.get("allAuthors"), stages.get("nameMatching"), stages.get("abstractCrawl")))
+
+
+# Compares results against a baseline results file. Returns a list of what got worse by more than the tolerance.
+def compareBaseline(results, baselineFile, tolerance):
+    with open(baselineFile, "rt", encoding="utf-8") as inputFile:
+        baseline = {result["authors"]: result for result in json.load(inputFile)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get(result["authors"])
+        if old is None:
+            continue
+        if old.get("pagesPerSecond") and result["pagesPerSecond"] < old["pagesPerSecond"] * (1 - tolerance):
+            regressions.append("{} authors: {} pages/s, was {}".format(result["authors"], result["pagesPerSecond"], old["pagesPerSecond"]))
+        if old.get("peakRSSMB") and result["peakRSSMB"] and result["peakRSSMB"] > old["peakRSSMB"] * (1 + tolerance):
+            regressions.append("{} authors: peak RSS {} MB, was {}".format(result["authors"], result["peakRSSMB"], old["peakRSSMB"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AGU scraper offline against a mock confex server")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated meeting sizes, in authors")
+    parser.add_argument("--dept-size", type=int, default=100, help="how many people are in the department list")
+    parser.add_argument("--seed", type=int, default=2020)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the mock server waits before answering each request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of abstract pages the mock server answers with a 500 error")
+    parser.add_argument("--session-rate", type=float, default=0.1, help="fraction of authors with a session link, which the scraper should skip without downloading")
+    parser.add_argument("--max-concurrent-requests", type=int, default=8)
+    parser.add_argument("--requests-per-second", type=float, default=1000, help="rate limit. Much higher than for the real server, since this is all on this computer")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default="agu2020_benchmark.json", help="results get saved here")
+    parser.add_argument("--baseline", default="", help="earlier results file to check for slowdowns against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="how much worse than the baseline is allowed, as a fraction")
+    parser.add_argument("--child", nargs=3, metavar=("URL", "DEPTLIST", "OUTPUT"), help=argparse.SUPPRESS) # used by the benchmark itself to run one size
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(runOnce(*args.child, args)))
+        raise SystemExit
+
+    results = []
+    for numAuthors in [int(x) for x in args.sizes.split(",")]:
+        print("Benchmarking {} authors...".format(numAuthors), flush=True)
+        results.append(benchmarkSize(numAuthors, args))
+    printTable(results)
+    with open(args.output, "wt", encoding="utf-8") as outfile:
+        json.dump({"settings": {key: value for key, value in vars(args).items() if key != "child"}, "results": results}, outfile, indent=2)
+    print("\nResults written to {}".format(args.output))
+
+    if args.baseline:
+        regressions = compareBaseline(results, args.baseline, args.tolerance)
+        if regressions:
+            raise SystemExit("Slower or bigger than {}:\n{}".format(args.baseline, "\n".join(regressions)))
+        print("No regressions against {}".format(args.baseline))
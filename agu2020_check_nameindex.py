@@ -0,0 +1,49 @@
+# Checks that AuthorIndex (agu2020_tools.py) finds exactly the same AGU names as the old nested loop, `[x for x in authors if person in x]`.
+# No downloading: it uses a fixed list of tricky names plus a batch of random made-up ones, so it gives the same answer every time.
+# Run it with `python agu2020_check_nameindex.py` after changing AuthorIndex. It exits with an error and prints the names that disagree if anything's off.
+
+# importing libraries
+import random
+from agu2020_tools import AuthorIndex
+
+# AGU names the way they show up on allauthors.html, including the awkward ones
+fixedAuthors = ["Smith, J.", "Smith, J. A.", "Smith, J. A. B.", "Smith, Ja.", "McSmith, J.", "Goldsmith, J.", "Smith-Jones, J.", "Smith Jones, J.", "Smith, K.",
+                "de la Smith, J.", "Smith, J., Jr.", "Jones, J., Smith, J.", "Smithers, J.", "mith, J.", ", J.", "Smith,J.", "Smith", "no match", "", "Ångström, A."]
+
+# Department names the way readDeptList() makes them ("Lastname, I."), plus the "no match" placeholder and an empty surname
+fixedPeople = ["Smith, J.", "Smith, J. A.", "McSmith, J.", "Smith, K.", "mith, J.", "Jones, J.", "Ångström, A.", "Smith, Z.", "no match", ", J.", ", ", "Smith", ""]
+
+
+# The old way, which is what the index has to agree with
+def oldMatch(authors, person):
+    return [x for x in authors if person in x]
+
+
+# Returns a list of (person, index matches, old loop matches) for everyone the two ways disagree on
+def compare(authors, people):
+    authorIndex = AuthorIndex(authors)
+    mismatches = []
+    for person in people:
+        new, old = authorIndex.match(person), oldMatch(authors, person)
+        if new != old:
+            mismatches.append((person, new, old))
+    return mismatches
+
+
+# Random names from a tiny alphabet so there are lots of shared surnames, substrings and extra ", " in them
+def randomNames(rng, count):
+    letters = "ab, .S"
+    return ["".join(rng.choice(letters) for x in range(rng.randint(0, 10))) for y in range(count)]
+
+
+if __name__ == "__main__":
+    mismatches = compare(fixedAuthors, fixedPeople)
+    rng = random.Random(2020)
+    for x in range(300):
+        authors = randomNames(rng, rng.randint(0, 40))
+        mismatches += compare(authors, randomNames(rng, 20) + [name for name in authors if ", " in name][:5])
+    if mismatches:
+        for person, new, old in mismatches[:20]:
+            print("{!r}: index found {!r}, old loop found {!r}".format(person, new, old))
+        raise SystemExit("AuthorIndex disagrees with the old loop for {} names".format(len(mismatches)))
+    print("AuthorIndex matches the old loop for every name.")
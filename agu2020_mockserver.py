@@ -0,0 +1,213 @@
+# Offline stand-in for the agu.confex.com meeting website, for testing and benchmarking the scraper without hitting the real server
+#
+# Makes up a fake meeting (authors, papers, sessions) and serves it with the same page structure the scraper's xpaths expect:
+#   /agu/fm20/webprogram/allauthors.html   <div class="item"> per author, with <div class="author"> and <div class="papers"><a class="index" href="Paper123.html">
+#   /agu/fm20/webprogram/Paper123.html     <span class="number">, <div class="subtext"> title, <div class="paperauthors"> with affiliations, <div class="datetime">
+#   /agu/fm20/webprogram/Session12.html    a session page (the scraper should never download these)
+# Everything is generated from a seed, so the same settings always make exactly the same meeting.
+# Pages send ETag and Last-Modified headers and answer conditional requests with 304, like the real server, so the scraper's cache can be tested too.
+#
+# Run it on its own with e.g.
+#   python agu2020_mockserver.py --authors 10000 --port 8020 --dept-list dept.csv
+# and point aguAllAuthorsURL in agu2020_scrape.py at http://127.0.0.1:8020/agu/fm20/webprogram/allauthors.html
+
+# importing libraries
+import argparse
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+webprogramPath = "/agu/fm20/webprogram/"
+umassAffiliation = "University of Massachusetts Amherst, Department of Geosciences, Amherst, MA, United States"
+otherAffiliations = ["University of Colorado Boulder, Boulder, CO, United States", "NASA Goddard Space Flight Center, Greenbelt, MD, United States",
+                     "University of Washington Seattle Campus, Seattle, WA, United States", "GFZ German Research Centre for Geosciences, Potsdam, Germany",
+                     "Massachusetts Institute of Technology, Cambridge, MA, United States", "US Geological Survey, Reston, VA, United States"]
+syllables = ["an", "ber", "cor", "dal", "en", "fel", "gar", "hol", "is", "jen", "kin", "lar", "mor", "nel", "or", "pet", "quin", "ros", "son", "tor", "ul", "van", "wil", "yor", "zel"]
+words = ["glacial", "sediment", "isotope", "tectonic", "climate", "basin", "mantle", "erosion", "carbon", "record", "Holocene", "river", "fault", "magma", "ocean", "model"]
+
+
+# The made-up meeting: who the authors are, which papers they're on, and everything on each paper's page.
+# numPapers defaults to about 60% of the number of authors, and surnames are picked from a pool a third that size so there are plenty of "Lastname, I." collisions like on the real site.
+class MockCorpus:
+    def __init__(self, numAuthors, seed=2020, numPapers=None, umassRate=0.05, sessionRate=0.1, abstractWords=250):
+        rng = random.Random(seed)
+        self.seed = seed
+        numPapers = numPapers or max(1, int(numAuthors * 0.6))
+        surnames = [(rng.choice(syllables) + rng.choice(syllables) + rng.choice(syllables)).capitalize() for x in range(max(1, numAuthors // 3))]
+
+        self.authors = [] # (name, affiliation) in the order they're listed on allauthors.html
+        seen = set()
+        while len(self.authors) < numAuthors:
+            initials = rng.choice("ABCDEFGHJKLMNPRSTW") + "."
+            if rng.random() < 0.3:
+                initials += " " + rng.choice("ABCDEFGHJKLMNPRSTW") + "."
+            name = "{}, {}".format(rng.choice(surnames), initials)
+            if name in seen:
+                continue
+            seen.add(name)
+            self.authors.append((name, umassAffiliation if rng.random() < umassRate else rng.choice(otherAffiliations)))
+        self.authors.sort()
+
+        # which papers & sessions each author is on
+        self.papers = [[] for x in range(numPapers)] # author numbers on each paper
+        self.authorLinks = []
+        for authorNumber in range(numAuthors):
+            links = []
+            for x in range(rng.choice([1, 1, 1, 2, 2, 3])):
+                paperNumber = rng.randrange(numPapers)
+                if authorNumber not in self.papers[paperNumber]:
+                    self.papers[paperNumber].append(authorNumber)
+                    links.append("Paper{}.html".format(100000 + paperNumber))
+            if rng.random() < sessionRate:
+                links.append("Session{}.html".format(10000 + rng.randrange(max(1, numPapers // 20))))
+            self.authorLinks.append(links)
+        self.abstractWords = abstractWords
+
+    def allAuthorsPage(self):
+        parts = ["<html><head><title>Fall Meeting 2020: All Authors</title></head><body><div class=\"content\">"]
+        for (name, affiliation), links in zip(self.authors, self.authorLinks):
+            parts.append("<div class=\"item\">\r\n\t<div class=\"author\">\r\n\t\t{}\r\n\t</div>\r\n\t<div class=\"papers\">".format(name))
+            for link in links:
+                parts.append("<a class=\"index\" href=\"{}\">{}</a> ".format(link, link.replace(".html", "")))
+            parts.append("</div>\r\n</div>\r\n")
+        parts.append("</div></body></html>")
+        return "".join(parts).encode("utf-8")
+
+    # Returns the page for a PaperNNN.html file name, or None if there's no such paper
+    def paperPage(self, paperNumber):
+        paperNumber -= 100000
+        if paperNumber < 0 or paperNumber >= len(self.papers):
+            return None
+        rng = random.Random(self.seed * 1000003 + paperNumber)
+        paperAuthors = self.papers[paperNumber] or [rng.randrange(len(self.authors))]
+        affiliations = list(dict.fromkeys(self.authors[x][1] for x in paperAuthors))
+        authorsHTML = ", ".join("<b>{}</b><sup>{}</sup>".format(self.authors[x][0], affiliations.index(self.authors[x][1]) + 1) for x in paperAuthors)
+        authorsHTML += ", " + ", ".join("<i>(<sup>{}</sup>){}</i>".format(i + 1, affiliation) for i, affiliation in enumerate(affiliations))
+        start = datetime(2020, 12, 7) + timedelta(days=rng.randrange(10))
+        if rng.random() < 0.5:
+            dateTime = (start + timedelta(hours=rng.randrange(4, 20), minutes=rng.choice([0, 4, 8, 12, 30, 45]))).strftime(r"%A, %d %B %Y: %H:%M")
+        else:
+            dateTime = start.strftime(r"%A, %d %B %Y") # posters don't have a time
+        title = " ".join(rng.choice(words) for x in range(rng.randint(5, 12))).capitalize()
+        abstract = " ".join(rng.choice(words) for x in range(self.abstractWords))
+        return ("<html><head><title>{title}</title></head><body><div class=\"content\">"
+                "<h2><span class=\"number\">EP{num}-0{n}</span></h2>"
+                "<div class=\"subtext\">{title}</div>\r\n"
+                "<div class=\"paperauthors\">\r\n\t{authors}\r\n</div>\r\n"
+                "<div class=\"datetime\">{dateTime}</div>"
+                "<div class=\"abstract\"><p>{abstract}</p></div>"
+                "</div></body></html>").format(title=title, num=paperNumber % 100, n=rng.randint(1, 9), authors=authorsHTML, dateTime=dateTime, abstract=abstract).encode("utf-8")
+
+    def sessionPage(self, sessionNumber):
+        return "<html><body><div class=\"content\"><h2>Session {}</h2><div class=\"subtext\">A whole session</div></div></body></html>".format(sessionNumber).encode("utf-8")
+
+    # Writes a department list CSV (fullname,firstname,first initial,lastname, same format agu2020_scrape.py reads) of deptSize U-Mass authors from the corpus
+    def writeDeptList(self, deptListFile, deptSize=100):
+        umassAuthors = [name for name, affiliation in self.authors if affiliation == umassAffiliation][:deptSize]
+        with open(deptListFile, "wt") as outfile:
+            for name in umassAuthors:
+                lastName, initials = name.split(", ")
+                outfile.write("{} {},{},{},{}\n".format(initials[0], lastName, initials[0], initials[0], lastName))
+            outfile.write("\n") # the scraper wants a blank line at the end of the file
+        return len(umassAuthors)
+
+
+# Serves a MockCorpus over HTTP.
+# latency is how many seconds to wait before answering each request, and errorRate is the fraction of paper pages that come back as "500 Internal Server Error".
+# Which pages are broken is picked from the URL, so it's the same ones every time.
+class MockConfexServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, corpus, host="127.0.0.1", port=0, latency=0.0, errorRate=0.0):
+        self.corpus = corpus
+        self.latency = latency
+        self.errorRate = errorRate
+        self.allAuthors = corpus.allAuthorsPage()
+        self.lastModified = formatdate(1607299200, usegmt=True) # the morning of December 7th, 2020
+        super().__init__((host, port), MockConfexHandler)
+
+    def url(self):
+        return "http://{}:{}{}allauthors.html".format(self.server_address[0], self.server_address[1], webprogramPath)
+
+    def isBroken(self, path):
+        return int(hashlib.sha256(path.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF < self.errorRate
+
+    # Starts serving on a background thread and returns it
+    def startInBackground(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class MockConfexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, so the scraper's connection pooling works like it does against the real server
+    disable_nagle_algorithm = True # otherwise every response on a kept-alive connection waits ~40 ms for the headers' ACK before the body goes out
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        fileName = self.path[len(webprogramPath):] if self.path.startswith(webprogramPath) else ""
+        body = None
+        if fileName == "allauthors.html":
+            body = server.allAuthors
+        elif fileName.startswith("Paper") and fileName.endswith(".html") and fileName[5:-5].isdigit():
+            if server.isBroken(self.path):
+                return self.sendBody(500, b"<html><body>Internal Server Error</body></html>")
+            body = server.corpus.paperPage(int(fileName[5:-5]))
+        elif fileName.startswith("Session") and fileName.endswith(".html") and fileName[7:-5].isdigit():
+            body = server.corpus.sessionPage(int(fileName[7:-5]))
+        if body is None:
+            return self.sendBody(404, b"<html><body>Not Found</body></html>")
+
+        etag = "\"{}\"".format(hashlib.sha256(body).hexdigest()[:16])
+        if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == server.lastModified:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.sendBody(200, body, {"ETag": etag, "Last-Modified": server.lastModified})
+
+    def sendBody(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for start in range(0, len(body), 65536): # big pages go out a piece at a time, like a real server
+            self.wfile.write(body[start:start + 65536])
+
+    def log_message(self, format, *args):
+        pass # no printing a line for every request
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a made-up AGU meeting website for testing the scraper offline")
+    parser.add_argument("--authors", type=int, default=1000, help="how many authors the meeting has")
+    parser.add_argument("--papers", type=int, default=None, help="how many papers (default: 60%% of the number of authors)")
+    parser.add_argument("--seed", type=int, default=2020, help="random seed, so the same settings make the same meeting")
+    parser.add_argument("--umass-rate", type=float, default=0.05, help="fraction of authors from U-Mass")
+    parser.add_argument("--session-rate", type=float, default=0.1, help="fraction of authors with a session link")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering each request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of paper pages that return a 500 error")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8020)
+    parser.add_argument("--dept-list", default="", help="also write a department list CSV of U-Mass authors to this file")
+    parser.add_argument("--dept-size", type=int, default=100, help="how many people to put in the department list")
+    args = parser.parse_args()
+
+    corpus = MockCorpus(args.authors, args.seed, args.papers, args.umass_rate, args.session_rate)
+    if args.dept_list:
+        print("Wrote {} department members to {}".format(corpus.writeDeptList(args.dept_list, args.dept_size), args.dept_list))
+    server = MockConfexServer(corpus, args.host, args.port, args.latency, args.error_rate)
+    print("Serving {} authors and {} papers at {}".format(len(corpus.authors), len(corpus.papers), server.url()), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
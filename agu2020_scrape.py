@@ -8,60 +8,94 @@
 # NOTE: using lxml library with xpaths here to parse out the html as it is orders of magnitude faster & uses less resources than other parsers
 
 # importing libraries
+import cProfile
 import os
+import pstats
 import re
 import requests
-import time
-from datetime import datetime
 from lxml import html
-from lxml import etree
+from agu2020_tools import readDeptList, fetchPage, fetchPageChunks, iterAuthors, matchDeptPresenters, planAbstractURLs, scrapeAbstracts, buildAbstractDict, listDeptPresenters, renderSchedule, AuthorIndex, TokenBucket, ResponseCache, ScrapeStore, RunMetrics # helper functions live in agu2020_tools.py, which needs to be in the same folder as this script
 print("libraries loaded")
 
 # Parameters
 deptListFile = r""
 outputScheduleHTML = r""
 aguAllAuthorsURL = r"https://agu.confex.com/agu/fm20/webprogram/allauthors.html"
+maxConcurrentRequests = 8 # how many abstract pages can be downloading at the same time
+requestsPerSecond = 3 # rate limit for the confex server. The old loop did one page at a time with time.sleep(0.1) in between, so it managed about 1 / (0.1 s + however long a page took), which is around 3 per second for a ~0.2 s page. See the README for working it out from your own run
+parseWorkers = os.cpu_count() or 1 # how many worker processes parse abstract pages while the rest are still downloading. 0 parses them one at a time in this process instead
+earlyAbort = True # skip parsing an abstract page as soon as its author list shows there's nobody from U-Mass on it
+cacheDir = r"agu2020_cache" # folder to save downloaded pages in so reruns don't download everything again. Set to r"" to turn off the cache
+cacheMaxAge = 600 # seconds. Pages downloaded more recently than this are reused without even asking the server if they've changed
+cacheMaxSizeMB = 500 # oldest pages get deleted from the cache once it gets bigger than this
+stateDB = r"agu2020_state.sqlite" # SQLite database that keeps track of what's been scraped, so an interrupted run can pick up where it left off. Set to r"" to turn it off
+deltaOnly = False # set to True to skip writing the schedule when no abstracts are new, changed or gone since the last run
+appendSchedule = False # the schedule replaces whatever's in outputScheduleHTML, so rerunning doesn't stack up copies of it. Set to True to add it to the end of the file instead, like the old script did
+streamAllAuthors = True # parse allauthors.html a piece at a time while it downloads instead of loading the whole page into memory. Set to False to use the old html.fromstring() way
+checkNameIndex = False # set to True to double check that the fast name index finds exactly the same people as the old slow nested loop did, for this department list. agu2020_check_nameindex.py checks it against a fixed set of tricky names
+metricsReport = r"agu2020_metrics.json" # how long each step took, request times, cache hit rate, how many pages got skipped & why, etc... get saved here as JSON at the end of the run. Set to r"" to just print them
+profileParse = False # set to True to run the abstract parsing through cProfile (all in this process, no parse workers) and print where it spends its time
+parseProfileFile = r"agu2020_parse.prof" # where the cProfile stats get saved when profileParse is on, for looking at with snakeviz or pstats
+
+metrics = RunMetrics() # keeps track of how long each step takes and how the requests went. See RunMetrics in agu2020_tools.py
 
 # %% [markdown]
 # The following section reads a CSV file of all people in the department and parse that into a list you can use.
 #
-# The CSV file I use has a specific structure: fullname, firstname, first initial, lastname and that's what the following block of code parses. The file has no fieldnames on the first line.
+# The CSV file I use has a specific structure: fullname, firstname, first initial, lastname and that's what the following block of code (readDeptList() in agu2020_tools.py) parses. The file has no fieldnames on the first line.
 # I could use CSVDictReader to parse the file but it would take more lines of code to deal with the resulting dictionary.  This is "simpler".
 
 # %%
-# Little function to read a text file and dump each line into a list
-def buildList(list, listFile):
-    with open(listFile, "rt") as inputFile:
-        for line in inputFile:
-            trimmed = line.rstrip("\n") # to get rid of pesky \n character at end oof the file.
-            # Important to have blank line at end of file for this reason, otherwise script misses last line of file
-            list.append(trimmed)
-
-deptList = []
-buildList(deptList, deptListFile)
-print("Department list file successfully read and lists built")
-
-deptParsedList = []
-for x in deptList:
-    nameParse = re.search("(\w+),([\w\s-]+)$", x) # this uses regex to parse each line in CSV to only return the last 2 columns, which are first initial and last name.
-    if nameParse: # check to make sure the above parsing was successful and re() search object exists. Otherwise script will throw error
-        deptParsedList.append(nameParse.group(2) + ", " + nameParse.group(1) + ".") # this appends lastname, first initial to the list
-    else:
-        deptParsedList.append("no match")
+metrics.start("readDeptList")
+deptParsedList = readDeptList(deptListFile) # readDeptList() in agu2020_tools.py reads each line of the file into a list, and uses regex to turn each one into lastname, first initial
+metrics.stop("readDeptList")
 print("Department name list has been parsed")
 
 # %% [markdown]
 # The following block of code uses the requests and the lxml library to download and parse https://agu.confex.com/agu/fm20/webprogram/allauthors.html into an xml / html tree object that can be iterated through to extract the info. we want
+#
+# Downloaded pages get saved in cacheDir (see ResponseCache in agu2020_tools.py). When the script gets rerun, anything downloaded in the last cacheMaxAge seconds is reused as-is, and anything older is only downloaded again if the AGU server says it has changed. So a rerun during the conference only downloads what's new. This replaces the old 15 second wait after downloading the page, which never did anything since requests already waits for the whole page to arrive.
+#
+# What's been scraped so far gets saved in the stateDB SQLite database (see ScrapeStore in agu2020_tools.py) as we go. If the last run crashed or the server timed out partway through, this run picks up where it left off: the author list it already parsed gets loaded back out of the database, and abstracts it already finished don't get downloaded again. Abstract pages that haven't changed since they were last parsed don't get parsed again either.
+#
+# allauthors.html is many megabytes, so by default (streamAllAuthors = True) it isn't loaded into one big tree at all: it gets fed to lxml a chunk at a time as it downloads, and each author gets pulled out and thrown away as soon as their part of the page has come through (iterAuthors() in agu2020_tools.py). That keeps memory use flat however big the meeting is. Nothing actually gets downloaded until the next block starts looping through the authors.
 
 # %%
-# Retrieving the webpage using the requests module
-page = requests.get(aguAllAuthorsURL)
-print(page.url + "\nWaiting 15 seconds for full page load")
-time.sleep(15) # wait 15 seconds for the page to load: necessary in the thick of the conference when their server is under heavy load
+if cacheDir:
+    cache = ResponseCache(cacheDir, cacheMaxAge, cacheMaxSizeMB)
+else:
+    cache = None
+talkBaseURL = aguAllAuthorsURL.rsplit("/", 1)[0] + "/" # talk URLs on the page are relative to the folder allauthors.html is in
+
+savedAuthors = None
+if stateDB:
+    store = ScrapeStore(stateDB)
+    if store.startRun(aguAllAuthorsURL):
+        print("Last run didn't finish, picking up where it left off")
+        savedAuthors = store.loadAuthors() # the author list, if the last run got that far
+else:
+    store = None
+
+metrics.start("allAuthors") # downloading & parsing allauthors.html, which finishes at the end of the next block
+if savedAuthors is not None:
+    print("Using the list of AGU authors saved by the last run")
+elif streamAllAuthors:
+    print("Streaming {} into lxml".format(aguAllAuthorsURL))
+    authorRecords = iterAuthors(fetchPageChunks(aguAllAuthorsURL, TokenBucket(requestsPerSecond), cache=cache, metrics=metrics), talkBaseURL)
+else:
+    # Retrieving the webpage using the requests module
+    with requests.Session() as session:
+        page = fetchPage(session, aguAllAuthorsURL, TokenBucket(requestsPerSecond), cache=cache, metrics=metrics)
+    if page is None or page.status_code != 200:
+        raise SystemExit("Couldn't download {}".format(aguAllAuthorsURL))
+    if page.fromCache:
+        print(page.url + "\nUsing saved copy, page hasn't changed")
+    else:
+        print(page.url + "\nDownloaded") # no need for the old 15 second wait: requests doesn't hand the page back until the whole thing has arrived
 
-print("Parsing page with lxml")
-tree = html.fromstring(page.content) # loads page into object that lxml will deal with via html method
-allAuthors = tree.xpath('//div[@class="item"]') # extracts the div elements that contain the author info via their xpath
+    print("Parsing page with lxml")
+    tree = html.fromstring(page.content) # loads page into object that lxml will deal with via html method
+    allAuthors = tree.xpath('//div[@class="item"]') # extracts the div elements that contain the author info via their xpath
 
 # %% [markdown]
 # The following parses and cleans up the lxml object into a dictionary.
@@ -70,22 +104,33 @@ allAuthors = tree.xpath('//div[@class="item"]') # extracts the div elements that
 #
 # We want to create a dictionary from this with the structure {'lastname-initials': [list of URLs]}
 # Parsing the page into a dictionary of all the AGU presenters and URLs to their talks
+#
+# When streaming, iterAuthors() has already done the xpath & regex work below for each author, so we just drop its results into the dictionary.
 
 # %%
 aguAllAuthorsDict = {} # creates the dictionary that the following for loop will to add to.
-for x in allAuthors:
-    authorHash = x.xpath('.//div[@class="author"]/text()') # This returns a list object of the name and initials, which is, luckily, wrapped in a <div> with the css class "author"
-    authorParse = re.search("(\W*)([\w ,\.]*)(\W*)",authorHash[0]) # This strips a lot of invisible characters out of the text we just extracted.
-    author = str(authorParse.group(2)) # the actual author name we want is represented by the 2nd group of the regex search expression above.
-    # print(author)
-    talks = x.xpath('.//div[@class="papers"]/a[@class="index"]') # scrapes the list of URLs for each author
-    talkList = []
-    for talk in talks:
-        talkURL = talk.get('href')
-        talkList.append(r"https://agu.confex.com/agu/fm20/webprogram/" + talkURL) # adds the full URL
-    # print(talkList)
-    aguAllAuthorsDict[author] = talkList # adds author as the key for each dictionary item in aguAllAuthorsDict and the list of URLs as the value.
+if savedAuthors is not None:
+    aguAllAuthorsDict = savedAuthors
+elif streamAllAuthors:
+    for author, talkList in authorRecords:
+        aguAllAuthorsDict[author] = talkList
+else:
+    for x in allAuthors:
+        authorHash = x.xpath('.//div[@class="author"]/text()') # This returns a list object of the name and initials, which is, luckily, wrapped in a <div> with the css class "author"
+        authorParse = re.search("(\W*)([\w ,\.]*)(\W*)",authorHash[0]) # This strips a lot of invisible characters out of the text we just extracted.
+        author = str(authorParse.group(2)) # the actual author name we want is represented by the 2nd group of the regex search expression above.
+        # print(author)
+        talks = x.xpath('.//div[@class="papers"]/a[@class="index"]') # scrapes the list of URLs for each author
+        talkList = []
+        for talk in talks:
+            talkURL = talk.get('href')
+            talkList.append(talkBaseURL + talkURL) # adds the full URL
+        # print(talkList)
+        aguAllAuthorsDict[author] = talkList # adds author as the key for each dictionary item in aguAllAuthorsDict and the list of URLs as the value.
+metrics.stop("allAuthors")
 print("Successfully parsed all AGU authors into dictionary of LastName, Initials : ['talkURLs']")
+if store is not None and savedAuthors is None:
+    print("{} authors are new since the last run".format(store.saveAuthors(aguAllAuthorsDict)))
 
 # %% [markdown]
 # So we have a list of all the people in our department.
@@ -95,98 +140,107 @@ print("Successfully parsed all AGU authors into dictionary of LastName, Initials
 # NOTE: Because the AGU list is only last names + first initial, there will be mismatches and interlopers in the resulting dictionary who aren't in the department! We will deal with this further down in the code.
 #
 # This is *a lot faster* than going through the entire list of AGU authors and parsing each abstract for them to see if it contains "University of Massachuetts" like I do below... that would be tens of thousands of web pages to fetch and parse!
+#
+# Checking every department member against every AGU author gets slow with tens of thousands of authors and more than one department, so the AGU names go into an index first (AuthorIndex in agu2020_tools.py) that can find all the "Lastname, I." matches for a person without looking at every name. It finds exactly the same matches as the old `if person in x` loop. Set checkNameIndex = True in the parameters to run the old loop too and make sure.
 
 # %%
+metrics.start("nameMatching")
 allAuthorsList = list(aguAllAuthorsDict.keys()) # generates a list of all AGU presenters from the keys in the dictionary created above, since the keys are people's names with initials
-deptPresenters = {} # creating the dictionary to copy matches to.
-for person in deptParsedList:
-    for x in allAuthorsList:
-        if person in x:
-            deptPresenters[x] = aguAllAuthorsDict[x] # copies key/value pair from above dictionary to new dictionary to containi only department members
-        else:
-            pass
+authorIndex = AuthorIndex(allAuthorsList)
+deptPresenters = matchDeptPresenters(deptParsedList, aguAllAuthorsDict, authorIndex) # copies key/value pairs from above dictionary to new dictionary to containi only department members
+metrics.stop("nameMatching")
 print("Department members extracted from AGU presenter list.")
 
+if checkNameIndex: # the old nested loop, to make sure the index didn't miss anyone or add anyone
+    oldDeptPresenters = {}
+    for person in deptParsedList:
+        for x in allAuthorsList:
+            if person in x:
+                oldDeptPresenters[x] = aguAllAuthorsDict[x]
+    if list(oldDeptPresenters.items()) != list(deptPresenters.items()):
+        raise SystemExit("Name index matches don't agree with the old loop! {} vs {} matches".format(len(deptPresenters), len(oldDeptPresenters)))
+    print("Name index matches are the same as the old loop's.")
+
 # %% [markdown]
-# The following block iterates through each key (lastname and first initial) of the dictionary of department presenters created above, and then iterates through each URL in the list that is the value associated with that key.  It uses requests and lxml to download and parse each URL, which is a page with the talk title, authors, time, and abstract. It cleans dumps all of that info. (except the abstract) into two dictionaries that we can use to create some HTML to put up a custom talk schedule on our own site.
+# Before downloading anything, the following block flips the dictionary of department presenters around into a dictionary indexed by abstract URL, with the list of department presenters on each abstract as the value: {'URL': ['lastname-initials', ...]}
 #
-# All of the if / else loops to verify that the last-name initial pair really represents someone at U-Mass, check if the URL is valid, or if the URL is a link to a session, talk, or poster, then fetches the title, authors, abstract #, and time from their abstract page and dumps it into a dictionary where the abstract URL is the key.
+# A paper with five department co-authors shows up five times in the dictionary above, and this way it only gets downloaded and parsed once instead of five times. Since each URL / abstract may have more than one presenter in the department, the department presenters names are stored as a list and appended to.
 #
-# Since each URL / abstract may have more than one presenter in the department, the department presenters names are stored as a list and appended to, so that that particular nested dictionary key / value pair doesn't get overwritten each time the same URL is parsed.  We then have a loop to check if that URL has already been parsed: if so, it skips re-parsing that URL and just adds the person's name associated with that URL as an item in that list object to save processing time and my own sanity with debugging.
+# Links to whole sessions (they have "Session" in the URL) get thrown out here too, since we'd just skip them after downloading them anyway.
+
+# %%
+urlPresenters, sessionURLs = planAbstractURLs(deptPresenters) # {URL: [department presenters on that abstract]}
+metrics.count("dropped.session", len(sessionURLs))
+print("{} unique abstracts to scrape for {} possible department presenters. Skipped {} session pages.".format(len(urlPresenters), len(deptPresenters), len(sessionURLs)))
+
+# %% [markdown]
+# The following block iterates through each abstract URL in the dictionary created above.  It uses requests and lxml to download and parse each URL, which is a page with the talk title, authors, time, and abstract. It cleans dumps all of that info. (except the abstract) into a dictionary that we can use to create some HTML to put up a custom talk schedule on our own site.
 #
-# This uses requests.Session() to create a single persistant TCP connection open instead of opening a new session with each GET request to the server: it increases performance and carries much lower risk of overwhelming the server.
+# The if / else checks to verify that the last-name initial pair really represents someone at U-Mass, check if the URL is valid, then fetch the title, authors, and time from the abstract page are in parseAbstract() in agu2020_tools.py. The results get dumped into a dictionary where the abstract URL is the key.
+#
+# This uses a single pooled requests.Session() to keep a handful of persistant TCP connections open instead of opening a new session with each GET request to the server: it increases performance and carries much lower risk of overwhelming the server.
+#
+# Downloading and parsing happen at the same time (scrapeAbstracts() in agu2020_tools.py): a few threads download pages, maxConcurrentRequests at a time and no faster than requestsPerSecond (a token bucket rate limiter that replaces the old time.sleep(0.1). The default is about what the old one-page-at-a-time loop managed, so we don't hit the confex server any harder than before), and hand them to parseWorkers worker processes that do the lxml parsing on the other CPU cores. Downloaded pages wait in a line that only holds so many pages, so if parsing falls behind the downloading slows down to match instead of piling up pages in memory.
+#
+# Most of the URLs the "Lastname, I." matching turned up are other people with the same last name and initial. With earlyAbort = True each page gets checked while it's still downloading (AffiliationPrefilter in agu2020_tools.py), and as soon as its list of authors has come through without anyone from U-Mass the page is thrown out without ever being parsed. The rest of the page still gets downloaded, so the connection can be reused for the next page and the page can be cached like any other.
 
 # %%
 print("\n----------\nScraping abstracts for each department presenter\n----------")
-
-abstractByURLDict = {}
-with requests.Session() as session:
-    for person in deptPresenters.keys():
-         # container to dump dept. Presenter names into in case URL is associated with more than 1 person in dept.
-        print("\n\n--- Scraping presentations for {}".format(person))
-        # Have to declare these variables here so they don't become unbounded due to nested if/else loops below.
-        abstractTitle = ""
-        abstractAuthors = ""
-        abstractTime = ""
-        abstractFormat = ""
-        for presentationURL in deptPresenters[person]:
-            # personList = []
-            time.sleep(0.1) # rate limiter to stop requests from overwhelming server
-            abstractPage = session.get(presentationURL)
-            if abstractPage.status_code != 200: # checks to see if it's a broken URL.  If it is, it skips.
-                print("...URL broken, skipping.")
-                pass
-            else:
-                print ("- Parsing {}".format(presentationURL))
-                abstractTree = html.fromstring(abstractPage.content)
-                unparsedAuthorsStep1 = abstractTree.xpath('//div[@class="paperauthors"]') # grabbing whole element including inner html here because it's easier to parse than tacking /node() on the end of the xpath. /text() and //text() strip all the tags out and I want to keep the markup tags.
-                if not unparsedAuthorsStep1: # check to see if authors are actually listed and there is a value to parse. Sometimes there isn't an authors field and script aborts with traceback error, so this avoids that.
-                    print("...Abstract has no authors listed, skipping")
-                    pass
-                else:
-                    for elem in unparsedAuthorsStep1: # because xpath returns elements as list objects
-                        unparsedAuthorsStep2 = etree.tostring(elem, pretty_print=True, encoding='unicode') # Since the "authors" field has markup tags for superscript, bold, etc..., this uses etree method to get contents of the above xpath with enclosed tags: https://stackoverflow.com/questions/14896302/get-the-inner-html-of-a-element-in-lxml.  Encoding parameter is necessary for it to output as string object
-                        if "Session" in presentationURL: # Checks if URL is for a session description. If so, skip.
-                            print("...This is a page for a whole session. Not parsing that mess. Skipped.")
-                            break
-                        elif "University of Massachusetts" not in unparsedAuthorsStep2 and "Amherst" not in unparsedAuthorsStep2: # Checks if any of authors are from U-Mass Amherst.  If not, skip.
-                            print("...{} isn't a UMass person. Skipping.".format(person))
-                            break
-                        try:
-                            if abstractByURLDict[presentationURL]: # Checks if this URL has already been added to the dictionary.
-                                print("...URL has already been parsed. Adding {} to namefield in dictionary and skipping".format(person))
-                                abstractByURLDict[presentationURL]['deptPresenters'].append(person) # if it has, add person this is associated with as a presenter
-                                print("...{} are now both listed as presenters for this abstract".format(abstractByURLDict[presentationURL]['deptPresenters']))
-                                break
-                        except KeyError:
-                            print("...{} in department, parsing abstract and adding to dictonaries".format(person))
-                            personList = [person]
-                            abstractAuthors = unparsedAuthorsStep2.replace("<div class=\"paperauthors\">", "").replace("\t", "").replace("\r", "").replace("\n", "").replace("&#13;", "").replace("</div>", "") # removes characters I don't want.
-                            if abstractTree.xpath('//span[@class="number"]/text()'):
-                                abstractNumber = abstractTree.xpath('//span[@class="number"]/text()')[0] # Because xpath returns a list object with a single item, we have to plop the index on the end to get a string object. presuming there are no markup tags here
-                            else:
-                                pass
-                            # if abstractTree.xpath('//div[@class="subtext"]/text()'):
-                            unparsedabstractTitleStep1 = abstractTree.xpath('//div[@class="subtext"]') # Since there are markup tags in people's titles, so we have to go through the same process as with "authors" above...
-                            for elem in unparsedabstractTitleStep1:
-                                unparsedabstractTitleStep2 = etree.tostring(elem, pretty_print=True, encoding='unicode')
-                                abstractTitle = unparsedabstractTitleStep2.replace("<div class=\"subtext\">", "").replace("</div>", "").replace("&#13;", "").replace("\n", "").replace("\t", "").replace("\r", "")
-                            abstractTimeString = abstractTree.xpath('//div[@class="datetime"]/text()')[0] # we know there's no markup in this field so it's just a straight xpath grab.
-                            if ":" in abstractTimeString: # this checks if the presentation has an hour:minute stamp: if it doesn't, it's a poster & not a talk, and adjusts datetime processing to suit
-                                abstractTime = datetime.strptime(abstractTimeString, r"%A, %d %B %Y: %H:%M") # converts the presentation time from a string object to a datetime object for sorting later
-                                abstractFormat = "talk"
-                            else:
-                                abstractTime = datetime.strptime(abstractTimeString, r"%A, %d %B %Y")
-                                abstractFormat = "poster"
-
-                            # Now we parse all this into the 2 dictonaries described above:
-                            # The dictionary to be indexed by abstract URLs as the key:
-                            abstractByURLDict[presentationURL] = {} # defining the primary key to this dictionary which creates a nested dictionary
-                            abstractByURLDict[presentationURL]['deptPresenters'] = personList # creates a value in the nested dictionary
-                            abstractByURLDict[presentationURL]['title'] = abstractTitle
-                            abstractByURLDict[presentationURL]['authors'] = abstractAuthors
-                            abstractByURLDict[presentationURL]['time'] = abstractTime
-                            abstractByURLDict[presentationURL]['format'] = abstractFormat
+metrics.start("abstractCrawl")
+parseProfiler = cProfile.Profile() if profileParse else None
+
+print("Downloading {} abstract pages, {} at a time, and parsing them with {} workers".format(len(urlPresenters), maxConcurrentRequests, parseWorkers))
+parsedAbstracts = {} # {URL: {'title', 'authors', 'time', 'format'}} for every U-Mass abstract, in whatever order they finished
+pagesFromCache = 0
+changedURLs = [] # abstracts that are new or different since the last run, including ones that stopped being U-Mass abstracts or went missing
+for presentationURL, fromCache, status, record, changed in scrapeAbstracts(urlPresenters.keys(), maxConcurrentRequests, requestsPerSecond, cache, parseWorkers, store=store, earlyAbort=earlyAbort, metrics=metrics, profiler=parseProfiler):
+    if fromCache:
+        pagesFromCache += 1
+    if changed:
+        changedURLs.append(presentationURL)
+    personList = urlPresenters[presentationURL]
+    print("\n--- {} ({})".format(presentationURL, ", ".join(personList)))
+    if status == "broken": # checks to see if it's a broken URL or the request failed.  If it is, it skips.
+        print("...URL broken, skipping.")
+    elif status == "noAuthors":
+        print("...Abstract has no authors listed, skipping")
+    elif status == "notUMass":
+        print("...{} isn't a UMass person. Skipping.".format(", ".join(personList)))
+    else:
+        print("...{} in department, adding to dictonary".format(", ".join(personList)))
+        parsedAbstracts[presentationURL] = record
+if cache is not None:
+    print("{} of {} pages were reused from the cache".format(pagesFromCache, len(urlPresenters)))
+    cache.evict() # trims the cache back down to cacheMaxSizeMB
+metrics.stop("abstractCrawl")
+if parseProfiler is not None:
+    parseProfiler.dump_stats(parseProfileFile)
+    print("\nWhere parsing spent its time (full stats saved to {}):".format(parseProfileFile))
+    pstats.Stats(parseProfiler).sort_stats("cumulative").print_stats(15)
+
+# Now we parse all this into the dictonary described above, indexed by abstract URLs as the key.
+abstractByURLDict = buildAbstractDict(urlPresenters, parsedAbstracts)
+
+if store is not None:
+    droppedURLs = store.dropUnplanned(urlPresenters) # U-Mass talks from earlier runs that aren't on anyone's list any more
+    presenterURLs = store.updatePresenters(urlPresenters) # U-Mass talks that gained or lost department presenters, e.g. because the department list changed
+    print("\n{} abstracts are new or changed since the last run:".format(len(changedURLs) + len(droppedURLs) + len(presenterURLs)))
+    for presentationURL in changedURLs:
+        if presentationURL in parsedAbstracts:
+            print("- {} ({})".format(presentationURL, parsedAbstracts[presentationURL]['title']))
+        else:
+            print("- {} (no longer a U-Mass abstract)".format(presentationURL))
+    for presentationURL in droppedURLs:
+        print("- {} (no department presenters any more)".format(presentationURL))
+    for presentationURL in presenterURLs:
+        print("- {} (department presenters changed: {})".format(presentationURL, ", ".join(urlPresenters[presentationURL])))
+    if deltaOnly and not changedURLs and not droppedURLs and not presenterURLs:
+        store.finishRun()
+        store.close()
+        metrics.printSummary()
+        if metricsReport:
+            metrics.writeReport(metricsReport)
+        raise SystemExit("Nothing has changed since the last run, so the schedule doesn't need to be rewritten.")
 print ("----------\nSuccess Building Dictionary!")
 print("Done scraping!")
 
@@ -201,13 +255,7 @@ print("There are {} talks being given by department members at AGU this year!".f
 #
 
 # %%
-deptPresenterList= []
-for key1, value1 in abstractByURLDict.items():
-    for x in value1['deptPresenters']:
-        if x in deptPresenterList:
-            pass
-        else:
-            deptPresenterList.append(x)
+deptPresenterList = listDeptPresenters(abstractByURLDict)
 print("There are {} department members presenting at AGU this year".format(len(deptPresenterList)))
 for x in sorted(deptPresenterList):
     print(x)
@@ -228,85 +276,30 @@ for x in sortedDict:
 #
 # There are some SNAFUs with encoding of special characters.  If I had more time I could delve into that as it probably stems from issues with the input or output encoding from lxml.
 #
-# The following block parses the above list of dictionaries into an html table of a schedule of talks for folks in the department.
+# The following block parses the above list of dictionaries into an html table of a schedule of talks for folks in the department, and then an html table of talks organized by person after it, all written to the html file (or added to the end of it with appendSchedule = True).
+#
+# renderSchedule() in agu2020_tools.py does it all in one pass through the talks: each talk's title and time only get cleaned up once, and it gets filed under each of its department presenters for the index table as it goes, instead of searching through every talk again for every person. The whole thing gets written to the file in one go at the end.
 
 # %%
-with open(outputScheduleHTML,'a',encoding='utf-8') as outfile:
-    day = ""
-    lastTalkFormat = ""
-    outfile.write("<p>U-Mass Geosciences has a strong showing at the (virtual) annual Fall meeting of the <a href=\"https://www.agu.org/fall-meeting\" target=\"_blank\">American Geophysical Union</a> this year, with {} department members presenting {} talks December 7th - 16th, 2020. If you're attending #AGU2020 this year don't miss out! Here is a schedule of who is presenting and when:</p><p>Click <a href=\"#index\">here</a> to browse the presentations by author.".format(len(abstractByURLDict.items()), len(deptPresenterList)))
-    outfile.write("<table>")
-    for x in sortedDict:
-        currentDay = datetime.strftime(x[1]['time'], r"%A, %d %B %Y")
-        if currentDay != day:
-            outfile.write("<tr><td><h1>{}</h1></td></tr>".format(currentDay))
-            day = currentDay
-        else:
-            day = currentDay
+metrics.start("render")
+scheduleHTML = renderSchedule(sortedDict, deptPresenterList)
+with open(outputScheduleHTML, 'a' if appendSchedule else 'w', encoding='utf-8') as outfile:
+    outfile.write(scheduleHTML)
+metrics.stop("render")
+print("Schedule and index of department presenters written to {}".format(outputScheduleHTML))
 
-        if x[1]['format'] == "talk":
-            time = datetime.strftime(x[1]['time'], r"%A, %d %B %Y - %I:%M %p")
-            talkFormat = "Talk"
-        else:
-            time = datetime.strftime(x[1]['time'], r"%A, %d %B %Y")
-            talkFormat = "Poster"
-
-        if talkFormat != lastTalkFormat:
-            if talkFormat == "Poster":
-                outfile.write("<tr><td><h2>Posters:</h2></td></tr>")
-            elif talkFormat == "Talk":
-                outfile.write("<tr><td><h2>Talks:</h2></td></tr>")
-        elif talkFormat == lastTalkFormat:
-            pass
-        else:
-            print("WHOAH something is wrong here with parsing talk formats.")
-            break
-        lastTalkFormat = talkFormat
-
-        authors = x[1]['authors']
-        fixedAuthors = authors.replace("Ã±", "ñ").replace("Â", "").replace("Ã§", "ç") # fixing weird encoding issues
-        title = x[1]['title']
-        fixedTitle = title.replace("â", "-").replace("Ë", "˚").replace("\n", "").replace("\t", "").replace("\r", "").replace("Ã", "í")
-        url = x[0]
-
-        outfile.write("<tr><td>")
-        # outfile.write("<p>")
-        outfile.write("<a href=\"{}\" target=\"_blank\">{}</a><br>".format(url, fixedTitle))
-        outfile.write("<em>{}</em>".format(time))
-        outfile.write("<p>{}</p>".format(fixedAuthors))
-        # outfile.write("</p>")
-        outfile.write("</td></tr>")
-    outfile.write("</table>")
-print("Schedule of department presenters written to {}".format(outputScheduleHTML))
+if store is not None:
+    store.finishRun() # so the next run starts fresh instead of trying to pick this one back up
+    store.close()
 
 # %% [markdown]
-# Now let's make an html table of talks organized by person!  This will append the table to the end of the html file above.
-#
-# We already have a nicely sorted list by time above, containing dictionary items for each talk.  We can iterate through the list of speakers we made a few blocks above and search through the list-of-dictionaries to populate that table:
+# Finally, a rundown of how the run went: how long each step took, how many requests were made and how long they took (50th / 90th / 99th percentile and slowest, in milliseconds), how much got downloaded, how much came out of the cache, and how many pages got skipped for each reason. It all gets saved to metricsReport as JSON too, so runs can be compared to each other.
 
 # %%
-with open(outputScheduleHTML,'a',encoding='utf-8') as outfile:
-    outfile.write("<h1 id=\"index\">Index of Presenters</h1>")
-    outfile.write("<table>")
-    for person in sorted(deptPresenterList):
-        outfile.write("<tr><td><h2>{}</h2></td></tr>".format(person))
-        for x in sortedDict:
-            if person not in x[1]['deptPresenters']:
-                pass
-            else:
-                title = x[1]['title']
-                fixedTitle = title.replace("â", "-").replace("Ë", "˚").replace("\n", "").replace("\t", "").replace("\r", "").replace("Ã", "í")
-                url = x[0]
-
-                if x[1]['format'] == "talk":
-                    time = datetime.strftime(x[1]['time'], r"%A, %d %B %Y - %I:%M %p")
-                else:
-                    time = datetime.strftime(x[1]['time'], r"%A, %d %B %Y")
-
-                outfile.write("<tr><td><a href=\"{}\" target=\"_blank\">{}</a></td></tr>".format(url, fixedTitle))
-                outfile.write("<tr><td>{}</td></tr>".format(time))
-
-print("Index of department presenters appended to {}".format(outputScheduleHTML))
+metrics.printSummary()
+if metricsReport:
+    metrics.writeReport(metricsReport)
+    print("Run metrics written to {}".format(metricsReport))
 
 
 # %%
@@ -0,0 +1,1035 @@
+# Helper functions and classes for agu2020_scrape.py / agu2020_scrape.ipynb
+#
+# The scraping script was getting long enough that the reusable bits (fetching, rate limiting, etc...) live here now. Some of them (the department list, abstract parsing
+# and schedule html) started out as parts of Joe Kopera's original agu2020_scrape.py and were pulled out of it into functions,
+# so the notebook cells can stay focused on the actual step-by-step scraping.
+
+# importing libraries
+import bisect
+import contextlib
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import requests
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from lxml import etree
+from lxml import html
+
+
+# Token bucket rate limiter.
+# Replaces the old time.sleep(0.1) between requests. The bucket holds up to `capacity` tokens and refills at `rate` tokens per second.
+# Every request has to take a token before it's sent, so no matter how many threads are fetching at once we never go over `rate` requests per second to the confex server.
+# Setting capacity to 1 means no bursts: requests are spaced out evenly like they were with the old sleep.
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.lastRefill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        # blocks until a token is available, then uses it up
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.lastRefill) * self.rate) # refill for however much time has passed since we last checked
+                self.lastRefill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate # how long until the next whole token shows up
+            time.sleep(wait) # sleep outside of the lock so other threads aren't stuck waiting on it
+
+
+# Keeps track of how long each stage of the run takes, how each HTTP request went, and how many pages got thrown out by each check, so we can see where the time goes and tune things from real numbers.
+# Everything's thread-safe so the downloading threads can all record to the same one.
+#
+# - start(stage) / stop(stage), or `with metrics.stage(name):`, time a stage of the run. Timing the same stage more than once adds up.
+# - count(name) adds to a counter, like "dropped.notUMass" or "cache.fresh".
+# - recordRequest() is called by the fetch functions for every HTTP request: how long it took, how many bytes came back, and the status code (or "error").
+# - recordParse() is called by scrapeAbstracts() with how long each abstract took to parse.
+# - report() puts it all together into a dictionary, with percentiles for the request and parse times. writeReport() saves that as JSON.
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.startedAt = time.time()
+        self.stages = {} # {stage: total seconds}
+        self.stageStarts = {}
+        self.counters = {}
+        self.requests = [] # (seconds, bytes, status) for every HTTP request
+        self.parseTimes = []
+
+    def start(self, stage):
+        self.stageStarts[stage] = time.perf_counter()
+
+    def stop(self, stage):
+        elapsed = time.perf_counter() - self.stageStarts.pop(stage)
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0) + elapsed
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        self.start(stage)
+        try:
+            yield
+        finally:
+            self.stop(stage)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def recordRequest(self, seconds, bytesRead, status):
+        with self.lock:
+            self.requests.append((seconds, bytesRead, status))
+
+    def recordParse(self, seconds):
+        with self.lock:
+            self.parseTimes.append(seconds)
+
+    # nearest-rank percentiles of a list of times, in milliseconds
+    def percentiles(self, times):
+        if not times:
+            return {}
+        times = sorted(times)
+        summary = {}
+        for percent in (50, 90, 99):
+            summary["p{}".format(percent)] = round(times[max(0, math.ceil(len(times) * percent / 100) - 1)] * 1000, 2) # the smallest time that at least percent% of the times are <= to
+        summary["max"] = round(times[-1] * 1000, 2)
+        return summary
+
+    def report(self):
+        with self.lock:
+            statusCounts = {}
+            for seconds, bytesRead, status in self.requests:
+                statusCounts[str(status)] = statusCounts.get(str(status), 0) + 1
+            cacheHits = self.counters.get("cache.fresh", 0) + self.counters.get("cache.revalidated", 0)
+            cacheLookups = cacheHits + self.counters.get("cache.miss", 0)
+            return {
+                "startedAt": datetime.fromtimestamp(self.startedAt).isoformat(),
+                "totalSeconds": round(time.time() - self.startedAt, 3),
+                "stageSeconds": {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+                "requests": {
+                    "count": len(self.requests),
+                    "bytes": sum(x[1] for x in self.requests),
+                    "statusCodes": statusCounts,
+                    "latencyMs": self.percentiles([x[0] for x in self.requests]),
+                },
+                "cacheHitRate": round(cacheHits / cacheLookups, 3) if cacheLookups else None,
+                "parse": {
+                    "count": len(self.parseTimes),
+                    "totalSeconds": round(sum(self.parseTimes), 3),
+                    "timeMs": self.percentiles(self.parseTimes),
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def writeReport(self, reportFile):
+        with open(reportFile, "wt", encoding="utf-8") as outfile:
+            json.dump(self.report(), outfile, indent=2)
+
+    def printSummary(self):
+        report = self.report()
+        print("\n----------\nRun metrics\n----------")
+        for stage, seconds in report["stageSeconds"].items():
+            print("{}: {:.2f} s".format(stage, seconds))
+        print("{} requests, {:.1f} MB, latency {}".format(report["requests"]["count"], report["requests"]["bytes"] / 1024 / 1024, report["requests"]["latencyMs"]))
+        if report["cacheHitRate"] is not None:
+            print("Cache hit rate: {:.0%}".format(report["cacheHitRate"]))
+        for name, count in report["counters"].items():
+            print("{}: {}".format(name, count))
+
+
+# Makes a requests.Session whose connection pool is big enough for all the fetching threads.
+# By default requests only keeps 10 connections per host, and threads past that would open & throw away new TCP connections with every request.
+def buildSession(maxConcurrentRequests):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=maxConcurrentRequests)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Stand-in for a requests response when the page comes out of the on-disk cache instead of the server.
+# It only has the bits of a response that the scraping script actually uses.
+class CachedResponse:
+    def __init__(self, url, content, headers):
+        self.url = url
+        self.status_code = 200 # we only ever cache good pages
+        self.content = content
+        self.headers = headers
+        self.fromCache = True
+
+
+# On-disk cache of downloaded pages so we don't have to re-download thousands of unchanged pages every time the script gets rerun.
+#
+# For each URL there's a little .json file (named after a hash of the URL) with the ETag / Last-Modified headers the server sent and when we last downloaded it.
+# The actual page is saved under a hash of its contents in the bodies folder, so pages that are exactly the same are only stored once.
+#
+# - If we downloaded a page less than maxAge seconds ago we just use the saved copy and don't bother the server at all.
+# - If it's older than that we ask the server if it's changed since (If-None-Match / If-Modified-Since). If the server says "304 Not Modified" we use the saved copy, which is a tiny response instead of the whole page.
+# - evict() deletes the least recently used pages once the cache gets bigger than maxSizeMB.
+class ResponseCache:
+    def __init__(self, cacheDir, maxAge=600, maxSizeMB=500):
+        self.cacheDir = cacheDir
+        self.bodyDir = os.path.join(cacheDir, "bodies")
+        self.entryDir = os.path.join(cacheDir, "entries")
+        self.maxAge = maxAge
+        self.maxSize = maxSizeMB * 1024 * 1024
+        self.lock = threading.Lock()
+        os.makedirs(self.bodyDir, exist_ok=True)
+        os.makedirs(self.entryDir, exist_ok=True)
+
+    def entryPath(self, url):
+        return os.path.join(self.entryDir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    # Writes to a temporary file and then renames it, so a crash or another thread never leaves a half-written file behind
+    def writeFile(self, path, data):
+        tempPath = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tempPath, "wb") as outfile:
+            outfile.write(data)
+        os.replace(tempPath, path)
+
+    # Returns the saved entry for a URL as a dictionary, or None if we don't have it (or its page got evicted)
+    def lookup(self, url):
+        try:
+            with open(self.entryPath(url), "rt", encoding="utf-8") as infile:
+                entry = json.load(infile)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url or not os.path.exists(os.path.join(self.bodyDir, entry["contentHash"])):
+            return None
+        return entry
+
+    def isFresh(self, entry):
+        return time.time() - entry["fetchedAt"] < self.maxAge
+
+    # Headers to send so the server can reply "304 Not Modified" instead of sending the whole page again
+    def conditionalHeaders(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("lastModified"):
+            headers["If-Modified-Since"] = entry["lastModified"]
+        return headers
+
+    # Marks the entry as just used so evict() keeps it around
+    def touch(self, entry):
+        entry["lastUsed"] = time.time()
+        self.writeFile(self.entryPath(entry["url"]), json.dumps(entry).encode("utf-8"))
+
+    def load(self, entry):
+        with open(os.path.join(self.bodyDir, entry["contentHash"]), "rb") as infile:
+            content = infile.read()
+        self.touch(entry)
+        return CachedResponse(entry["url"], content, {"Content-Type": entry.get("contentType", "")})
+
+    # Same as load() but hands the saved page back a chunk at a time instead of reading the whole thing into memory
+    def iterBody(self, entry, chunkSize=65536):
+        self.touch(entry)
+        with open(os.path.join(self.bodyDir, entry["contentHash"]), "rb") as infile:
+            while True:
+                chunk = infile.read(chunkSize)
+                if not chunk:
+                    break
+                yield chunk
+
+    def saveEntry(self, url, contentHash, size, headers):
+        now = time.time()
+        entry = {
+            "url": url,
+            "contentHash": contentHash,
+            "size": size,
+            "etag": headers.get("ETag", ""),
+            "lastModified": headers.get("Last-Modified", ""),
+            "contentType": headers.get("Content-Type", ""),
+            "fetchedAt": now,
+            "lastUsed": now,
+        }
+        self.writeFile(self.entryPath(url), json.dumps(entry).encode("utf-8"))
+
+    def store(self, url, response):
+        self.storeContent(url, response.content, response.headers)
+
+    def storeContent(self, url, content, headers):
+        contentHash = hashlib.sha256(content).hexdigest()
+        bodyPath = os.path.join(self.bodyDir, contentHash)
+        if not os.path.exists(bodyPath):
+            self.writeFile(bodyPath, content)
+        self.saveEntry(url, contentHash, len(content), headers)
+
+    # Saves a page while it's still being downloaded: passes each chunk through to whoever is parsing it and writes it to disk at the same time.
+    # The page only gets added to the cache once the whole thing has come through, so a download that dies halfway doesn't leave a broken page in the cache.
+    def storeChunks(self, url, headers, chunks):
+        tempPath = os.path.join(self.bodyDir, "download.{}.tmp".format(threading.get_ident()))
+        contentHash = hashlib.sha256()
+        size = 0
+        with open(tempPath, "wb") as outfile:
+            for chunk in chunks:
+                contentHash.update(chunk)
+                size += len(chunk)
+                outfile.write(chunk)
+                yield chunk
+        contentHash = contentHash.hexdigest()
+        os.replace(tempPath, os.path.join(self.bodyDir, contentHash))
+        self.saveEntry(url, contentHash, size, headers)
+
+    # Server said the page hasn't changed, so reset the clock on it and use the saved copy
+    def refresh(self, entry):
+        entry["fetchedAt"] = time.time()
+        return self.load(entry)
+
+    # Deletes the least recently used pages until the cache is under maxSizeMB
+    def evict(self):
+        with self.lock:
+            entries = []
+            for fileName in os.listdir(self.entryDir):
+                if not fileName.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(self.entryDir, fileName), "rt", encoding="utf-8") as infile:
+                        entries.append((fileName, json.load(infile)))
+                except (OSError, ValueError):
+                    continue
+            entries.sort(key=lambda x: x[1].get("lastUsed", 0), reverse=True) # most recently used first
+            keepHashes = set()
+            totalSize = 0
+            for fileName, entry in entries:
+                if entry["contentHash"] not in keepHashes:
+                    if totalSize + entry["size"] > self.maxSize:
+                        os.remove(os.path.join(self.entryDir, fileName))
+                        continue
+                    totalSize += entry["size"]
+                    keepHashes.add(entry["contentHash"])
+            for fileName in os.listdir(self.bodyDir): # and then delete any pages that nobody points to anymore
+                if fileName not in keepHashes and not fileName.endswith(".tmp"):
+                    os.remove(os.path.join(self.bodyDir, fileName))
+
+
+# Fetches a single URL once the rate limiter lets us.
+# If there's a cache, pages that were downloaded recently enough come straight out of it without asking the server, and older ones are only re-downloaded if they've changed.
+# Returns None instead of throwing a traceback if the server times out or drops the connection, so one bad URL doesn't kill the whole run.
+def fetchPage(session, url, bucket, timeout=30, cache=None, metrics=None):
+    entry = None
+    headers = {}
+    if cache is not None:
+        entry = cache.lookup(url)
+        if entry is not None:
+            if cache.isFresh(entry):
+                countCache(metrics, "cache.fresh")
+                return cache.load(entry)
+            headers = cache.conditionalHeaders(entry)
+    bucket.take()
+    requestStart = time.perf_counter()
+    try:
+        response = session.get(url, timeout=timeout, headers=headers)
+    except requests.RequestException as err:
+        print("...Request for {} failed: {}".format(url, err))
+        if metrics is not None:
+            metrics.recordRequest(time.perf_counter() - requestStart, 0, "error")
+        if cache is not None:
+            countCache(metrics, "cache.miss") # the request got sent, so the cache didn't save us one
+        return None
+    if metrics is not None:
+        metrics.recordRequest(time.perf_counter() - requestStart, len(response.content), response.status_code)
+    if cache is not None:
+        if response.status_code == 304 and entry is not None:
+            countCache(metrics, "cache.revalidated")
+            return cache.refresh(entry)
+        countCache(metrics, "cache.miss") # anything other than a 304 means the cache couldn't help, even if the page turns out to be broken
+        if response.status_code == 200:
+            cache.store(url, response)
+    response.fromCache = False
+    return response
+
+
+# Little helper so the fetch functions don't need an `if metrics is not None` around every cache counter
+def countCache(metrics, name):
+    if metrics is not None:
+        metrics.count(name)
+
+
+# Downloads a page a chunk at a time (stream=True) instead of all at once, so a huge page like allauthors.html never has to sit in memory in one piece.
+# Goes through the cache the same way fetchPage() does: fresh or unchanged pages are read back off disk a chunk at a time instead.
+# Unlike fetchPage() this throws an error if the page can't be downloaded, since it's meant for pages the script can't do without.
+def fetchPageChunks(url, bucket, cache=None, timeout=30, chunkSize=65536, metrics=None):
+    entry = None
+    headers = {}
+    if cache is not None:
+        entry = cache.lookup(url)
+        if entry is not None:
+            if cache.isFresh(entry):
+                countCache(metrics, "cache.fresh")
+                yield from cache.iterBody(entry, chunkSize)
+                return
+            headers = cache.conditionalHeaders(entry)
+    bucket.take()
+    requestStart = time.perf_counter()
+    bytesRead = 0
+    with requests.Session() as session:
+        with session.get(url, timeout=timeout, headers=headers, stream=True) as response:
+            try:
+                if response.status_code == 304 and entry is not None:
+                    countCache(metrics, "cache.revalidated")
+                    entry["fetchedAt"] = time.time()
+                    yield from cache.iterBody(entry, chunkSize)
+                    return
+                if cache is not None:
+                    countCache(metrics, "cache.miss")
+                response.raise_for_status()
+                chunks = response.iter_content(chunkSize)
+                if cache is not None:
+                    chunks = cache.storeChunks(url, response.headers, chunks)
+                for chunk in chunks:
+                    bytesRead += len(chunk)
+                    yield chunk
+            finally: # the request isn't done until the whole page has been read, so this is timed once the last chunk is through
+                if metrics is not None:
+                    metrics.recordRequest(time.perf_counter() - requestStart, bytesRead, response.status_code)
+
+
+# Returns the first bit of text directly inside an element, same as xpath('text()')[0] would.
+# Returns None if there isn't any.
+def firstText(elem):
+    if elem.text is not None:
+        return elem.text
+    for child in elem:
+        if child.tail is not None:
+            return child.tail
+    return None
+
+
+# Streaming version of parsing allauthors.html.
+# Instead of building the whole page into one giant tree with html.fromstring() and then running xpaths on it, this feeds the page into lxml's HTMLPullParser a chunk at a time as it downloads,
+# and yields an (author, [list of talk URLs]) tuple as soon as each <div class="item"> is finished.
+# Each item gets deleted from the tree once we're done with it, so memory use stays flat no matter how big the meeting is.
+#
+# It picks out the same things the xpaths in the script do:
+#   author name: first bit of text in .//div[@class="author"], cleaned up with the same regex
+#   talk URLs:   href of every .//div[@class="papers"]/a[@class="index"], with talkBaseURL tacked on the front
+def iterAuthors(chunks, talkBaseURL):
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    itemDepth = 0 # how many <div class="item"> we're inside of, since talks & authors only count inside one
+    authorHash = None
+    talkList = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if elem.tag != "div" and elem.tag != "a":
+                continue
+            elemClass = elem.get("class")
+            if event == "start":
+                if elemClass == "item":
+                    itemDepth += 1
+                    if itemDepth == 1:
+                        authorHash = None
+                        talkList = []
+                continue
+            if itemDepth == 0:
+                continue
+            if elemClass == "author" and authorHash is None:
+                authorHash = firstText(elem)
+            elif elemClass == "index" and elem.tag == "a":
+                parent = elem.getparent()
+                if parent is not None and parent.tag == "div" and parent.get("class") == "papers" and elem.get("href") is not None:
+                    talkList.append(talkBaseURL + elem.get("href"))
+            elif elemClass == "item":
+                itemDepth -= 1
+                if itemDepth == 0:
+                    if authorHash is not None:
+                        authorParse = re.search(r"(\W*)([\w ,\.]*)(\W*)", authorHash) # This strips a lot of invisible characters out of the text, same as the non-streaming version
+                        yield str(authorParse.group(2)), talkList
+                    # throwing away the item we just finished, plus anything before it, so the tree never grows
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+    parser.close()
+
+
+# Reads the CSV file of everyone in the department and turns it into a list of "Lastname, I." names to look for in the AGU author list.
+# The CSV file I use has a specific structure: fullname, firstname, first initial, lastname, with no fieldnames on the first line.
+def readDeptList(deptListFile):
+    deptList = []
+    with open(deptListFile, "rt") as inputFile:
+        for line in inputFile:
+            trimmed = line.rstrip("\n") # to get rid of pesky \n character at end oof the file.
+            # Important to have blank line at end of file for this reason, otherwise script misses last line of file
+            deptList.append(trimmed)
+
+    deptParsedList = []
+    for x in deptList:
+        nameParse = re.search(r"(\w+),([\w\s-]+)$", x) # this uses regex to parse each line in CSV to only return the last 2 columns, which are first initial and last name.
+        if nameParse: # check to make sure the above parsing was successful and re() search object exists. Otherwise script will throw error
+            deptParsedList.append(nameParse.group(2) + ", " + nameParse.group(1) + ".") # this appends lastname, first initial to the list
+        else:
+            deptParsedList.append("no match")
+    return deptParsedList
+
+
+# Picks out every AGU author whose name matches someone in the department and returns them as {'lastname-initials': [list of URLs]}, same as aguAllAuthorsDict but only department members (and interlopers with the same last name & initial)
+def matchDeptPresenters(deptParsedList, aguAllAuthorsDict, authorIndex):
+    deptPresenters = {}
+    for person in deptParsedList:
+        for x in authorIndex.match(person):
+            deptPresenters[x] = aguAllAuthorsDict[x]
+    return deptPresenters
+
+
+# Flips {presenter: [URLs]} around into {URL: [department presenters on that abstract]} so each abstract only gets downloaded and parsed once, no matter how many department co-authors it has.
+# Links to whole sessions (they have "Session" in the URL) get left out. Returns the flipped dictionary and the set of session URLs that got left out.
+def planAbstractURLs(deptPresenters):
+    urlPresenters = {}
+    sessionURLs = set()
+    for person in deptPresenters.keys():
+        for presentationURL in deptPresenters[person]:
+            if "Session" in presentationURL: # Checks if URL is for a session description. If so, skip.
+                sessionURLs.add(presentationURL)
+            else:
+                urlPresenters.setdefault(presentationURL, []).append(person)
+    return urlPresenters, sessionURLs
+
+
+# Puts the parsed abstracts together with their department presenters into the {URL: {'deptPresenters', 'title', 'authors', 'time', 'format'}} dictionary the schedule gets made from.
+# Going through the URLs in their original order (instead of the order they finished scraping in) keeps talks at the same time in the same order on the schedule from run to run.
+def buildAbstractDict(urlPresenters, parsedAbstracts):
+    abstractByURLDict = {}
+    for presentationURL, personList in urlPresenters.items():
+        if presentationURL in parsedAbstracts:
+            abstractByURLDict[presentationURL] = {} # defining the primary key to this dictionary which creates a nested dictionary
+            abstractByURLDict[presentationURL]['deptPresenters'] = personList # creates a value in the nested dictionary
+            abstractByURLDict[presentationURL].update(parsedAbstracts[presentationURL]) # title, authors, time & format
+    return abstractByURLDict
+
+
+# List of every department member presenting at least one abstract, without duplicates, in the order they first show up
+def listDeptPresenters(abstractByURLDict):
+    deptPresenterList = []
+    for key1, value1 in abstractByURLDict.items():
+        for x in value1['deptPresenters']:
+            if x not in deptPresenterList:
+                deptPresenterList.append(x)
+    return deptPresenterList
+
+
+# Index of all the AGU author names so we don't have to check every department member against every single AGU author.
+#
+# The old way was `if person in x` for every person and every AGU author, which is (department size) x (all AGU authors) string searches.
+# Department names always look like "Lastname, I." so wherever one of them shows up inside an AGU name, its ", " lines up with a ", " in the AGU name, and the AGU name has the surname right before that comma.
+# So for every ", " in every AGU name we save the text before the comma *backwards* in a sorted list. Then finding every AGU name with "...Lastname, " in it is just a binary search (bisect) for names that start with "emantsaL".
+# The handful of names that turns up still gets the old `person in x` check, so the matches are exactly the same as before, including multi-initial ones like "Smith, J. A." and substring ones like "McSmith, J.".
+class AuthorIndex:
+    def __init__(self, authors):
+        self.authors = list(authors)
+        entries = []
+        for i, x in enumerate(self.authors):
+            comma = x.find(", ")
+            while comma != -1:
+                entries.append((x[:comma][::-1], i))
+                comma = x.find(", ", comma + 1)
+        entries.sort()
+        self.keys = [entry[0] for entry in entries]
+        self.positions = [entry[1] for entry in entries]
+
+    # Returns every AGU name that contains `person`, in the same order as the list the index was built from
+    def match(self, person):
+        comma = person.find(", ")
+        if comma == -1: # not a "Lastname, I." name (like the "no match" placeholder), so the index can't help. Do it the slow way
+            return [x for x in self.authors if person in x]
+        surname = person[:comma][::-1]
+        start = bisect.bisect_left(self.keys, surname)
+        end = bisect.bisect_left(self.keys, surname + "\U0010ffff") # everything that starts with the backwards surname sorts between these two
+        positions = sorted(set(self.positions[start:end]))
+        return [self.authors[i] for i in positions if person in self.authors[i]]
+
+
+# Checks if any of the authors in an abstract's "paperauthors" html are from U-Mass Amherst.
+# Change this if you're scraping for a different institution.
+def isUMass(authorsHTML):
+    return "University of Massachusetts" in authorsHTML or "Amherst" in authorsHTML
+
+
+# Cheap check of an abstract page while it's still downloading, so we don't have to parse pages that aren't U-Mass abstracts.
+# Most of the URLs the "Lastname, I." matching turns up are other people with the same last name & initial, and we used to download and fully parse every one of those just to throw it away.
+# feed() it the page a chunk at a time. It returns "notUMass" as soon as the first paperauthors block has come through without a U-Mass author, "ok" if it has one, and None until then.
+class AffiliationPrefilter:
+    def __init__(self):
+        self.parser = etree.HTMLPullParser(events=("end",), tag="div") # only bother telling us about <div>s
+        self.verdict = None
+
+    def feed(self, chunk):
+        if self.verdict is None:
+            self.parser.feed(chunk)
+            for event, elem in self.parser.read_events():
+                if elem.get("class") == "paperauthors":
+                    authorsHTML = etree.tostring(elem, encoding='unicode', with_tail=False) # same check parseAbstract() does, but without any text after the </div> since that might not have downloaded yet
+                    self.verdict = "ok" if isUMass(authorsHTML) else "notUMass"
+                    break
+        return self.verdict
+
+
+# Pulls the title, authors, time and format out of an abstract page.
+# This is the CPU-heavy part of scraping (building the tree, the xpaths, tostring() and all the .replace() calls), so it's a plain function that can be sent off to another process.
+# Returns a (status, record) tuple. status is "ok" if it's a U-Mass abstract, otherwise the reason it got skipped: "noAuthors" or "notUMass".
+# record is {'title', 'authors', 'time', 'format'} for "ok" pages, and None otherwise.
+def parseAbstract(content):
+    abstractTitle = ""
+    abstractTree = html.fromstring(content)
+    unparsedAuthorsStep1 = abstractTree.xpath('//div[@class="paperauthors"]') # grabbing whole element including inner html here because it's easier to parse than tacking /node() on the end of the xpath. /text() and //text() strip all the tags out and I want to keep the markup tags.
+    if not unparsedAuthorsStep1: # check to see if authors are actually listed and there is a value to parse. Sometimes there isn't an authors field and script aborts with traceback error, so this avoids that.
+        return "noAuthors", None
+    unparsedAuthorsStep2 = etree.tostring(unparsedAuthorsStep1[0], pretty_print=True, encoding='unicode') # Since the "authors" field has markup tags for superscript, bold, etc..., this uses etree method to get contents of the above xpath with enclosed tags: https://stackoverflow.com/questions/14896302/get-the-inner-html-of-a-element-in-lxml.  Encoding parameter is necessary for it to output as string object
+    if not isUMass(unparsedAuthorsStep2): # Checks if any of authors are from U-Mass Amherst.  If not, skip.
+        return "notUMass", None
+    abstractAuthors = unparsedAuthorsStep2.replace("<div class=\"paperauthors\">", "").replace("\t", "").replace("\r", "").replace("\n", "").replace("&#13;", "").replace("</div>", "") # removes characters I don't want.
+    unparsedabstractTitleStep1 = abstractTree.xpath('//div[@class="subtext"]') # Since there are markup tags in people's titles, so we have to go through the same process as with "authors" above...
+    for elem in unparsedabstractTitleStep1:
+        unparsedabstractTitleStep2 = etree.tostring(elem, pretty_print=True, encoding='unicode')
+        abstractTitle = unparsedabstractTitleStep2.replace("<div class=\"subtext\">", "").replace("</div>", "").replace("&#13;", "").replace("\n", "").replace("\t", "").replace("\r", "")
+    abstractTimeString = abstractTree.xpath('//div[@class="datetime"]/text()')[0] # we know there's no markup in this field so it's just a straight xpath grab.
+    if ":" in abstractTimeString: # this checks if the presentation has an hour:minute stamp: if it doesn't, it's a poster & not a talk, and adjusts datetime processing to suit
+        abstractTime = datetime.strptime(abstractTimeString, r"%A, %d %B %Y: %H:%M") # converts the presentation time from a string object to a datetime object for sorting later
+        abstractFormat = "talk"
+    else:
+        abstractTime = datetime.strptime(abstractTimeString, r"%A, %d %B %Y")
+        abstractFormat = "poster"
+    return "ok", {'title': abstractTitle, 'authors': abstractAuthors, 'time': abstractTime, 'format': abstractFormat}
+
+
+# Downloads an abstract page a chunk at a time, running AffiliationPrefilter on it as it comes in.
+# If the page turns out not to have any U-Mass authors it gets thrown out without ever being parsed. The rest of the page still gets read (as long as it's under drainLimit bytes),
+# since closing the connection partway through a page means the next request has to open a new one, which costs more than a few KB of abstract text.
+# Reading it all also means the page can go in the cache like any other, so a rerun only has to ask the server whether it's changed.
+# Goes through the cache the same way fetchPage() does. Saved pages still get prefiltered, which saves building the whole tree for them.
+# Returns a (fromCache, status, content) tuple: status is "broken" if it couldn't be downloaded (content is None), "notUMass" if the prefilter threw it out, otherwise None.
+# content is the whole page, or None for a "notUMass" page that was too big to finish reading.
+def fetchAbstract(session, url, bucket, timeout=30, cache=None, chunkSize=16384, metrics=None, drainLimit=262144):
+    entry = None
+    headers = {}
+    if cache is not None:
+        entry = cache.lookup(url)
+        if entry is not None:
+            if cache.isFresh(entry):
+                countCache(metrics, "cache.fresh")
+                return prefilterSaved(cache.load(entry).content, chunkSize, metrics)
+            headers = cache.conditionalHeaders(entry)
+    bucket.take()
+    requestStart = time.perf_counter()
+    chunks = []
+    status = "error"
+    verdict = None
+    revalidated = False
+    try:
+        with session.get(url, timeout=timeout, headers=headers, stream=True) as response:
+            status = response.status_code
+            if response.status_code != 200:
+                response.content # reads the (empty or short) body so the connection goes back to the pool instead of getting closed
+            if response.status_code == 304 and entry is not None:
+                revalidated = True
+                countCache(metrics, "cache.revalidated")
+                return prefilterSaved(cache.refresh(entry).content, chunkSize, metrics)
+            if response.status_code != 200:
+                return False, "broken", None
+            prefilter = AffiliationPrefilter()
+            for chunk in response.iter_content(chunkSize):
+                chunks.append(chunk)
+                if verdict is None:
+                    verdict = prefilter.feed(chunk)
+                    if verdict == "notUMass" and metrics is not None:
+                        metrics.count("prefilter.notUMass")
+                if verdict == "notUMass" and sum(len(chunk) for chunk in chunks) > drainLimit:
+                    return False, "notUMass", None # too much left to be worth reading, so leaving the with block closes the connection instead
+    except requests.RequestException as err:
+        print("...Request for {} failed: {}".format(url, err))
+        return False, "broken", None
+    finally:
+        if metrics is not None:
+            metrics.recordRequest(time.perf_counter() - requestStart, sum(len(chunk) for chunk in chunks), status)
+        if cache is not None and not revalidated:
+            countCache(metrics, "cache.miss") # the request got sent and the cache couldn't answer it, however it turned out
+    content = b"".join(chunks)
+    if cache is not None:
+        cache.storeContent(url, content, response.headers)
+    return False, "notUMass" if verdict == "notUMass" else None, content
+
+
+# The prefilter for pages that came out of the cache: there's no download to stop, but we can still skip parsing the rest of the page
+def prefilterSaved(content, chunkSize, metrics=None):
+    prefilter = AffiliationPrefilter()
+    for start in range(0, len(content), chunkSize):
+        if prefilter.feed(content[start:start + chunkSize]) == "notUMass":
+            if metrics is not None:
+                metrics.count("prefilter.notUMass")
+            return True, "notUMass", content
+    return True, None, content
+
+
+# parseAbstract(), plus how long it took. Returns (seconds, status, record).
+def timedParseAbstract(content):
+    parseStart = time.perf_counter()
+    status, record = parseAbstract(content)
+    return time.perf_counter() - parseStart, status, record
+
+
+# Makes the pool of worker processes that parseAbstract() runs in.
+# Worker processes are forked off this one where possible. On Windows (no fork) they'd have to re-import the scraping script from scratch, which would re-run the whole thing,
+# so there it falls back to threads instead. lxml lets go of the GIL for a lot of its parsing so threads still help some.
+def buildParsePool(parseWorkers):
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return ThreadPoolExecutor(max_workers=parseWorkers)
+    pool = ProcessPoolExecutor(max_workers=parseWorkers, mp_context=multiprocessing.get_context("fork"))
+    pool.submit(int).result() # starts up all the worker processes now, before any downloading threads exist, since forking a process that has threads running is asking for trouble
+    return pool
+
+
+# Downloads and parses abstract pages at the same time, so the CPU isn't sitting idle while we wait on the network and the network isn't sitting idle while we parse.
+#
+# - maxConcurrentRequests downloading threads share one pooled session. They put the raw pages on a queue that holds at most queueSize pages.
+#   requestsPerSecond caps how fast new requests are started (see TokenBucket), so having several in flight at once doesn't hit the server any harder than the old one-at-a-time loop did.
+#   If parsing falls behind, the queue fills up and the downloaders wait, so we never have a whole meeting's worth of pages sitting in memory.
+# - If anything goes wrong while this is running (or it's stopped early with Ctrl-C or by closing the generator), the downloading threads are told to stop,
+#   so they don't sit waiting forever on a full queue and keep the script from exiting.
+# - This function takes pages off the queue and hands them to parseWorkers worker processes running parseAbstract(), with at most 2 pages per worker waiting to be parsed.
+#   parseWorkers = 0 parses everything right here instead, one page at a time.
+# - With earlyAbort on, pages are downloaded with fetchAbstract(), which spots pages without any U-Mass authors from their author list and hands back "notUMass" without parsing them.
+# - If a ScrapeStore is passed in, every finished page gets saved to it as soon as it's done. URLs already finished earlier in the same (interrupted) run aren't downloaded again at all,
+#   and pages whose contents haven't changed since they were last parsed get their saved results instead of being parsed again.
+#
+# - If a RunMetrics is passed in, every request, parse time and how each URL turned out get recorded in it. If a cProfile.Profile is passed in as profiler, all the parsing
+#   happens in this process (no workers) with the profiler running, so you can see where parsing spends its time.
+#
+# Yields a (url, fromCache, status, record, changed) tuple for every URL as it gets finished, in whatever order they finish.
+# status is "broken" if the page couldn't be downloaded, otherwise it's whatever parseAbstract() said.
+# changed is True if the page is new or different from the last time it was saved in the store, or was a U-Mass abstract and now can't be downloaded (always True without a store).
+def scrapeAbstracts(urls, maxConcurrentRequests=8, requestsPerSecond=3, cache=None, parseWorkers=4, queueSize=32, store=None, earlyAbort=True, metrics=None, profiler=None):
+    # counts how each URL turned out (if we're keeping metrics) on its way out
+    def counted(result):
+        if metrics is not None:
+            status = result[2]
+            metrics.count("abstracts.ok" if status == "ok" else "dropped." + status)
+        return result
+
+    urls = list(urls)
+    if store is not None:
+        fetchURLs = []
+        for url in urls:
+            saved = store.finishedThisRun(url)
+            if saved is None:
+                fetchURLs.append(url)
+            else: # finished before the last run got interrupted
+                if metrics is not None:
+                    metrics.count("resume.skipped")
+                yield counted((url, True, saved["status"], saved["record"], saved["changed"]))
+        urls = fetchURLs
+
+    pageQueue = queue.Queue(maxsize=queueSize)
+    doneFetching = object() # put on the queue once every page has been downloaded
+    fetchErrors = []
+    if profiler is not None:
+        parseWorkers = 0 # the profiler can only see parsing that happens in this process
+    pool = buildParsePool(parseWorkers) if parseWorkers > 0 else None
+
+    stopFetching = threading.Event() # set when we're done with the downloaders, whether everything went fine or not
+    fetchPool = ThreadPoolExecutor(max_workers=maxConcurrentRequests)
+
+    # puts something on the queue, waiting if it's full, but giving up if we've been told to stop. Returns False if it gave up
+    def putPage(item):
+        while not stopFetching.is_set():
+            try:
+                pageQueue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fetchOne(session, url, bucket):
+        if stopFetching.is_set():
+            return
+        if earlyAbort:
+            putPage((url,) + fetchAbstract(session, url, bucket, cache=cache, metrics=metrics)) # waits here if the queue is full
+            return
+        page = fetchPage(session, url, bucket, cache=cache, metrics=metrics)
+        if page is None or page.status_code != 200:
+            putPage((url, False, "broken", None))
+        else:
+            putPage((url, page.fromCache, None, page.content))
+
+    def fetchAll():
+        try:
+            bucket = TokenBucket(requestsPerSecond)
+            with buildSession(maxConcurrentRequests) as session:
+                for future in [fetchPool.submit(fetchOne, session, url, bucket) for url in urls]:
+                    future.result()
+        except Exception as err:
+            fetchErrors.append(err)
+        finally:
+            putPage(doneFetching)
+
+    # saves a parsed page to the store (if there is one) and puts together the tuple to hand back
+    def finished(url, fromCache, contentHash, parseSeconds, status, record):
+        if metrics is not None and parseSeconds is not None:
+            metrics.recordParse(parseSeconds)
+        changed = True
+        if store is not None:
+            changed = store.saveAbstract(url, contentHash, status, record)
+        return counted((url, fromCache, status, record, changed))
+
+    fetcher = threading.Thread(target=fetchAll, daemon=True)
+    fetcher.start()
+    pending = {} # parsing jobs that have been handed to the workers: {future: (url, fromCache, contentHash)}
+    try:
+        while True:
+            item = pageQueue.get()
+            if item is doneFetching:
+                break
+            url, fromCache, status, content = item
+            if status == "broken":
+                changed = store.markBroken(url) if store is not None else True
+                yield counted((url, fromCache, "broken", None, changed))
+                continue
+            if status == "notUMass": # thrown out by the prefilter, no parsing needed. content is None if the page was too big to finish downloading, so there's nothing to hash
+                yield finished(url, fromCache, hashlib.sha256(content).hexdigest() if content is not None else None, None, "notUMass", None)
+                continue
+            contentHash = hashlib.sha256(content).hexdigest()
+            saved = store.unchangedAbstract(url, contentHash) if store is not None else None
+            if saved is not None: # same page as last time, no need to parse it again
+                if metrics is not None:
+                    metrics.count("parse.skippedUnchanged")
+                yield counted((url, fromCache, saved["status"], saved["record"], saved["changed"]))
+            elif pool is None:
+                if profiler is not None:
+                    parseSeconds, status, record = profiler.runcall(timedParseAbstract, content)
+                else:
+                    parseSeconds, status, record = timedParseAbstract(content)
+                yield finished(url, fromCache, contentHash, parseSeconds, status, record)
+            else:
+                pending[pool.submit(timedParseAbstract, content)] = (url, fromCache, contentHash)
+                while len(pending) >= parseWorkers * 2: # enough parsing is lined up, so wait for some of it to finish before taking more pages off the queue
+                    done, notDone = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, fromCache, contentHash = pending.pop(future)
+                        yield finished(url, fromCache, contentHash, *future.result())
+        for future in as_completed(pending):
+            url, fromCache, contentHash = pending[future]
+            yield finished(url, fromCache, contentHash, *future.result())
+        if fetchErrors:
+            raise fetchErrors[0]
+    finally:
+        # Tells the downloaders to stop, and empties the queue in case any of them are waiting for room on it. Without this, a crash while parsing
+        # would leave them stuck on a full queue, and Python waits for them before it exits, so the script would hang instead of stopping
+        stopFetching.set()
+        while True:
+            try:
+                pageQueue.get_nowait()
+            except queue.Empty:
+                break
+        fetchPool.shutdown(cancel_futures=True) # pages that haven't started downloading yet never will
+        fetcher.join()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+# Keeps track of scraping results in a SQLite database file, so that:
+# - if a run crashes or the confex server times out partway through, the next run picks up where it left off instead of starting from zero
+# - pages that haven't changed since they were last parsed don't have to be parsed again (every page is saved along with a hash of its contents)
+# - we can tell which abstracts are new or changed since the last run
+#
+# Every run gets a row in the runs table, along with the allauthors.html URL it was for. A run that never got to finishRun() gets resumed by the next startRun() for the same meeting.
+# Abstracts remember which run they were first seen in, last changed in, and last checked in.
+class ScrapeStore:
+    def __init__(self, dbPath):
+        self.db = sqlite3.connect(dbPath)
+        self.db.execute("PRAGMA journal_mode=WAL") # so saving after every single abstract doesn't slow things down much
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (runId INTEGER PRIMARY KEY AUTOINCREMENT, startedAt REAL, finishedAt REAL, authorsSaved INTEGER DEFAULT 0, meetingURL TEXT);
+            CREATE TABLE IF NOT EXISTS authors (author TEXT PRIMARY KEY, position INTEGER, talkURLs TEXT, firstSeenRun INTEGER);
+            CREATE TABLE IF NOT EXISTS abstracts (url TEXT PRIMARY KEY, contentHash TEXT, status TEXT, title TEXT, authors TEXT, time TEXT, format TEXT, firstSeenRun INTEGER, changedRun INTEGER, checkedRun INTEGER, presenters TEXT);
+        """)
+        if "meetingURL" not in [row[1] for row in self.db.execute("PRAGMA table_info(runs)")]: # databases made before runs remembered which meeting they were for
+            self.db.execute("ALTER TABLE runs ADD COLUMN meetingURL TEXT")
+        if "presenters" not in [row[1] for row in self.db.execute("PRAGMA table_info(abstracts)")]: # databases made before abstracts remembered their department presenters
+            self.db.execute("ALTER TABLE abstracts ADD COLUMN presenters TEXT")
+        self.db.commit()
+        self.runId = None
+        self.resumed = False
+
+    # Starts a new run for the meeting at meetingURL (its allauthors.html), or picks the last one back up if it never finished and was for the same meeting. Returns True if it's resuming.
+    # An unfinished run for a different meeting is left alone, since its saved author list would be the wrong one.
+    def startRun(self, meetingURL):
+        lastRun = self.db.execute("SELECT runId, finishedAt, meetingURL FROM runs ORDER BY runId DESC LIMIT 1").fetchone()
+        if lastRun is not None and lastRun[1] is None and lastRun[2] == meetingURL:
+            self.runId = lastRun[0]
+            self.resumed = True
+        else:
+            if lastRun is not None and lastRun[1] is None:
+                print("Last run was for {}, not {}, so starting over instead of picking it back up".format(lastRun[2], meetingURL))
+            self.runId = self.db.execute("INSERT INTO runs (startedAt, meetingURL) VALUES (?, ?)", (time.time(), meetingURL)).lastrowid
+            self.resumed = False
+            self.db.commit()
+        return self.resumed
+
+    def finishRun(self):
+        self.db.execute("UPDATE runs SET finishedAt = ? WHERE runId = ?", (time.time(), self.runId))
+        self.db.commit()
+
+    # Saves the whole {author: [talk URLs]} dictionary. Returns how many authors weren't there last time.
+    def saveAuthors(self, authorsDict):
+        oldAuthors = set(row[0] for row in self.db.execute("SELECT author FROM authors"))
+        firstSeen = dict(self.db.execute("SELECT author, firstSeenRun FROM authors"))
+        self.db.execute("DELETE FROM authors")
+        self.db.executemany("INSERT INTO authors (author, position, talkURLs, firstSeenRun) VALUES (?, ?, ?, ?)",
+                            ((author, position, json.dumps(talkList), firstSeen.get(author, self.runId)) for position, (author, talkList) in enumerate(authorsDict.items())))
+        self.db.execute("UPDATE runs SET authorsSaved = 1 WHERE runId = ?", (self.runId,))
+        self.db.commit()
+        return len(set(authorsDict) - oldAuthors)
+
+    # Returns the {author: [talk URLs]} dictionary if this run already saved it before getting interrupted, otherwise None
+    def loadAuthors(self):
+        if not self.db.execute("SELECT authorsSaved FROM runs WHERE runId = ?", (self.runId,)).fetchone()[0]:
+            return None
+        return {author: json.loads(talkURLs) for author, talkURLs in self.db.execute("SELECT author, talkURLs FROM authors ORDER BY position")}
+
+    def rowToResult(self, row):
+        status, title, authors, abstractTime, abstractFormat, changedRun = row
+        record = None
+        if status == "ok":
+            record = {'title': title, 'authors': authors, 'time': datetime.fromisoformat(abstractTime), 'format': abstractFormat}
+        return {"status": status, "record": record, "changed": changedRun == self.runId}
+
+    # Returns the saved results for a URL if it was already finished earlier in this run, otherwise None
+    def finishedThisRun(self, url):
+        row = self.db.execute("SELECT status, title, authors, time, format, changedRun FROM abstracts WHERE url = ? AND checkedRun = ?", (url, self.runId)).fetchone()
+        return self.rowToResult(row) if row is not None else None
+
+    # Returns the saved results for a URL if the page is exactly the same as when it was saved, otherwise None
+    def unchangedAbstract(self, url, contentHash):
+        row = self.db.execute("SELECT status, title, authors, time, format, changedRun FROM abstracts WHERE url = ? AND contentHash = ?", (url, contentHash)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE abstracts SET checkedRun = ? WHERE url = ?", (self.runId, url))
+        self.db.commit()
+        return self.rowToResult(row)
+
+    # Saves a freshly parsed abstract. Returns True if it's new or different from what was saved before, and it's a U-Mass abstract now or was one before.
+    # Other people's pages coming and going doesn't change the schedule, so that doesn't count as changed.
+    def saveAbstract(self, url, contentHash, status, record):
+        if record is None:
+            record = {'title': None, 'authors': None, 'time': None, 'format': None}
+        abstractTime = record['time'].isoformat() if record['time'] is not None else None
+        newValues = (status, record['title'], record['authors'], abstractTime, record['format'])
+        oldRow = self.db.execute("SELECT status, title, authors, time, format, firstSeenRun, changedRun, presenters FROM abstracts WHERE url = ?", (url,)).fetchone()
+        if oldRow is None:
+            firstSeenRun, changedRun = self.runId, self.runId if status == "ok" else None
+        elif tuple(oldRow[:5]) != newValues and "ok" in (status, oldRow[0]):
+            firstSeenRun, changedRun = oldRow[5], self.runId
+        else: # page changed but nothing we care about in it did
+            firstSeenRun, changedRun = oldRow[5], oldRow[6]
+        presenters = oldRow[7] if oldRow is not None else None # kept as-is, updatePresenters() takes care of these
+        self.db.execute("INSERT OR REPLACE INTO abstracts (url, contentHash, status, title, authors, time, format, firstSeenRun, changedRun, checkedRun, presenters) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (url, contentHash) + newValues + (firstSeenRun, changedRun, self.runId, presenters))
+        self.db.commit()
+        return changedRun == self.runId
+
+    # Remembers that a page couldn't be downloaded this time. Returns True if it was a U-Mass abstract last time, since then its talk drops off the schedule.
+    # checkedRun isn't touched, so if this run gets interrupted and resumed the page gets another try.
+    def markBroken(self, url):
+        row = self.db.execute("SELECT status FROM abstracts WHERE url = ?", (url,)).fetchone()
+        if row is None or row[0] == "broken":
+            return False
+        wasUMass = row[0] == "ok"
+        self.db.execute("UPDATE abstracts SET status = 'broken', contentHash = NULL, title = NULL, authors = NULL, time = NULL, format = NULL WHERE url = ?", (url,))
+        if wasUMass:
+            self.db.execute("UPDATE abstracts SET changedRun = ? WHERE url = ?", (self.runId, url))
+        self.db.commit()
+        return wasUMass
+
+    # Marks U-Mass abstracts from earlier runs that aren't in plannedURLs any more (the talk got withdrawn, or nobody in the department is on it now) as "dropped",
+    # so they count as changed in this run. Their content hash is cleared so that if they come back they get parsed again. Returns their URLs.
+    def dropUnplanned(self, plannedURLs):
+        plannedURLs = set(plannedURLs)
+        droppedURLs = [row[0] for row in self.db.execute("SELECT url FROM abstracts WHERE status = 'ok'") if row[0] not in plannedURLs]
+        self.db.executemany("UPDATE abstracts SET status = 'dropped', contentHash = NULL, changedRun = ? WHERE url = ?", ((self.runId, url) for url in droppedURLs))
+        self.db.commit()
+        return droppedURLs
+
+    # Saves which department presenters are on each abstract, from the {URL: [presenters]} dictionary.
+    # Changing the department list can add or take away presenters on a talk without the abstract page changing at all, and that changes the schedule's index of presenters,
+    # so U-Mass abstracts whose presenters are different from last time count as changed in this run. Returns the URLs of those that weren't already changed for some other reason.
+    def updatePresenters(self, urlPresenters):
+        changedURLs = []
+        for url, personList in urlPresenters.items():
+            presenters = json.dumps(sorted(set(personList)))
+            row = self.db.execute("SELECT status, changedRun, presenters FROM abstracts WHERE url = ?", (url,)).fetchone()
+            if row is None or row[2] == presenters:
+                continue
+            if row[0] == "ok" and row[1] != self.runId:
+                self.db.execute("UPDATE abstracts SET presenters = ?, changedRun = ? WHERE url = ?", (presenters, self.runId, url))
+                changedURLs.append(url)
+            else:
+                self.db.execute("UPDATE abstracts SET presenters = ? WHERE url = ?", (presenters, url))
+        self.db.commit()
+        return changedURLs
+
+    def close(self):
+        self.db.close()
+
+
+# Fixes up one talk for the schedule: cleans up the title & authors and formats the time, so each talk only has to be done once no matter how many department presenters it has
+def formatTalk(url, talk):
+    fixedTitle = talk['title'].replace("â", "-").replace("Ë", "˚").replace("\n", "").replace("\t", "").replace("\r", "").replace("Ã", "í")
+    fixedAuthors = talk['authors'].replace("Ã±", "ñ").replace("Â", "").replace("Ã§", "ç") # fixing weird encoding issues
+    if talk['format'] == "talk":
+        talkTime = datetime.strftime(talk['time'], r"%A, %d %B %Y - %I:%M %p")
+        talkFormat = "Talk"
+    else:
+        talkTime = datetime.strftime(talk['time'], r"%A, %d %B %Y")
+        talkFormat = "Poster"
+    return {'url': url, 'title': fixedTitle, 'authors': fixedAuthors, 'time': talkTime, 'format': talkFormat, 'day': datetime.strftime(talk['time'], r"%A, %d %B %Y")}
+
+
+# Builds the html for the whole schedule page in one go: the schedule of talks by day, and then the index of presenters.
+# sortedTalks is the list of (URL, talk dictionary) tuples sorted by time, and deptPresenterList is the list of department presenters.
+#
+# The index used to be made by going through every talk for every presenter. Now each talk gets added to a {presenter: [talks]} dictionary while we're going through them for the schedule,
+# so it's one pass through the talks no matter how many presenters there are. Everything gets collected into a list and joined into one string at the end instead of lots of little writes to the file.
+def renderSchedule(sortedTalks, deptPresenterList):
+    parts = []
+    talksByPresenter = {person: [] for person in deptPresenterList}
+    day = ""
+    lastTalkFormat = ""
+    parts.append("<p>U-Mass Geosciences has a strong showing at the (virtual) annual Fall meeting of the <a href=\"https://www.agu.org/fall-meeting\" target=\"_blank\">American Geophysical Union</a> this year, with {} department members presenting {} talks December 7th - 16th, 2020. If you're attending #AGU2020 this year don't miss out! Here is a schedule of who is presenting and when:</p><p>Click <a href=\"#index\">here</a> to browse the presentations by author.".format(len(sortedTalks), len(deptPresenterList)))
+    parts.append("<table>")
+    for url, talk in sortedTalks:
+        fixedTalk = formatTalk(url, talk)
+        for person in dict.fromkeys(talk['deptPresenters']): # dict.fromkeys() gets rid of any duplicate names without changing the order
+            talksByPresenter.setdefault(person, []).append(fixedTalk)
+
+        if fixedTalk['day'] != day:
+            parts.append("<tr><td><h1>{}</h1></td></tr>".format(fixedTalk['day']))
+            day = fixedTalk['day']
+        if fixedTalk['format'] != lastTalkFormat:
+            if fixedTalk['format'] == "Poster":
+                parts.append("<tr><td><h2>Posters:</h2></td></tr>")
+            else:
+                parts.append("<tr><td><h2>Talks:</h2></td></tr>")
+        lastTalkFormat = fixedTalk['format']
+
+        parts.append("<tr><td><a href=\"{}\" target=\"_blank\">{}</a><br><em>{}</em><p>{}</p></td></tr>".format(fixedTalk['url'], fixedTalk['title'], fixedTalk['time'], fixedTalk['authors']))
+    parts.append("</table>")
+
+    parts.append("<h1 id=\"index\">Index of Presenters</h1>")
+    parts.append("<table>")
+    for person in sorted(deptPresenterList):
+        parts.append("<tr><td><h2>{}</h2></td></tr>".format(person))
+        for fixedTalk in talksByPresenter[person]:
+            parts.append("<tr><td><a href=\"{}\" target=\"_blank\">{}</a></td></tr><tr><td>{}</td></tr>".format(fixedTalk['url'], fixedTalk['title'], fixedTalk['time']))
+    return "".join(parts)